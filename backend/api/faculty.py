@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from pydantic import BaseModel
 from typing import Optional, List
 import os
@@ -6,6 +6,7 @@ import json
 from services.file_service import get_file_service
 from services.embedding_service import get_embedding_service
 from services.rag_service import get_rag_service
+from services.job_queue import get_job_queue
 
 router = APIRouter()
 
@@ -16,6 +17,7 @@ class UploadResponse(BaseModel):
     subject: str
     unit: str
     filename: str
+    job_id: Optional[str] = None
 
 class StatusResponse(BaseModel):
     status: str
@@ -33,8 +35,7 @@ async def upload_file(
     subject: str = Form(...),
     unit: str = Form(...),
     file: UploadFile = File(...),
-    replace: str = Form("false"),  # "true" or "false" string
-    background_tasks: BackgroundTasks = None
+    replace: str = Form("false")  # "true" or "false" string
 ):
 
     
@@ -57,27 +58,20 @@ async def upload_file(
         replace_mode = replace.lower() == "true"
         save_path = file_service.save_file(subject, unit, file.filename, file_content, replace=replace_mode)
         
-        # Automatically generate embeddings in background
-        if background_tasks:
-            embedding_service = get_embedding_service()
-            background_tasks.add_task(
-                embedding_service.process_and_embed_documents,
-                subject,
-                unit
-            )
-            if replace_mode:
-                message = "File uploaded successfully. Previous files replaced. Embeddings are being generated automatically."
-            else:
-                message = "File uploaded successfully. Embeddings are being generated automatically in the background."
+        # Queue embedding generation; uploads to the same unit share one pending job
+        job = get_job_queue().enqueue(subject, unit)
+        if replace_mode:
+            message = "File uploaded successfully. Previous files replaced. Embeddings are being generated automatically."
         else:
-            message = "File uploaded successfully. Embeddings will be generated."
+            message = "File uploaded successfully. Embeddings are being generated automatically in the background."
         
         return UploadResponse(
             status="success",
             message=message,
             subject=subject,
             unit=unit,
-            filename=file.filename
+            filename=file.filename,
+            job_id=job["id"]
         )
         
     except Exception as e:
@@ -112,29 +106,17 @@ async def get_status(subject: str, unit: str):
 @router.post("/generate-embeddings")
 async def generate_embeddings(
     subject: str = Form(...),
-    unit: str = Form(...),
-    background_tasks: BackgroundTasks = None
+    unit: str = Form(...)
 ):
 
     
-    embedding_service = get_embedding_service()
-    
     try:
-        # Process in background if BackgroundTasks is available
-        if background_tasks:
-            background_tasks.add_task(
-                embedding_service.process_and_embed_documents,
-                subject,
-                unit
-            )
-            return {
-                "status": "processing",
-                "message": "Embedding generation started in background"
-            }
-        else:
-            # Process synchronously
-            result = embedding_service.process_and_embed_documents(subject, unit)
-            return result
+        job = get_job_queue().enqueue(subject, unit)
+        return {
+            "status": "processing",
+            "message": "Embedding generation queued",
+            "job_id": job["id"]
+        }
             
     except Exception as e:
         raise HTTPException(
@@ -142,6 +124,19 @@ async def generate_embeddings(
             detail=f"Error generating embeddings: {str(e)}"
         )
 
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+
+    job = get_job_queue().get_job(job_id)
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return job
+
 @router.post("/generate-content")
 async def generate_content(
     subject: str = Form(...),
@@ -163,11 +158,11 @@ async def generate_content(
     
     try:
         if content_type == "summary":
-            result = rag_service.generate_summary(subject, unit)
+            result = await rag_service.agenerate_summary(subject, unit)
         elif content_type == "mcq":
-            result = rag_service.generate_mcqs(subject, unit, count=10)
+            result = await rag_service.agenerate_mcqs(subject, unit, count=10)
         elif content_type == "flashcards":
-            result = rag_service.generate_flashcards(subject, unit, count=10)
+            result = await rag_service.agenerate_flashcards(subject, unit, count=10)
         else:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
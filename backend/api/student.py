@@ -1,8 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, AsyncIterator, Literal
+import json
+import asyncio
 from services.file_service import get_file_service
 from services.rag_service import get_rag_service
+from services.question_bank import get_question_bank, item_key
+from services.session_dedup import get_session_dedup
 
 router = APIRouter()
 
@@ -16,18 +21,57 @@ class MCQRequest(BaseModel):
     subject: str
     unit: str
     count: int = 10
+    # Quiz session; items near-duplicate to ones it has already seen are replaced
+    session_id: Optional[str] = None
+    # Older clients: the questions seen so far, used the same way
     previous_questions: Optional[List[str]] = None
 
 class FlashcardRequest(BaseModel):
     subject: str
     unit: str
     count: int = 10
+    session_id: Optional[str] = None
     previous_cards: Optional[List[str]] = None
 
 class AskRequest(BaseModel):
     subject: str
     unit: str
     question: str
+    # dense, keyword, hybrid or auto; the server default when omitted
+    retrieval: Optional[Literal["dense", "keyword", "hybrid", "auto"]] = None
+
+async def _take_from_bank(subject: str, unit: str, kind: str, count: int, session_id: Optional[str], previous: Optional[List[str]]) -> List[Dict]:
+
+    # Unseen pre-generated items, minus any close paraphrase of what the session
+    # has seen; only the items served count as served in the bank
+    session_dedup = get_session_dedup()
+    seen = session_dedup.seen_texts(session_id, kind) + (previous or [])
+    return await asyncio.to_thread(
+        get_question_bank().take, subject, unit, kind, count, seen,
+        lambda items: session_dedup.filter(session_id, kind, items, previous)
+    )
+
+def _live_previous(kind: str, session_id: Optional[str], previous: Optional[List[str]], served: List[Dict]) -> Optional[List[str]]:
+
+    # A session already remembers the bank items it was served; without one the
+    # live top-up must be told about them or it may repeat them in this response
+    if session_id or not served:
+        return previous
+    return (previous or []) + [item_key(kind, item) for item in served]
+
+async def _sse_events(events: AsyncIterator[Dict]) -> AsyncIterator[str]:
+
+    # One Server-Sent Event per item, JSON keeps newlines inside tokens intact
+    async for event in events:
+        yield f"data: {json.dumps(event)}\n\n"
+
+def _sse_response(events: AsyncIterator[Dict]) -> StreamingResponse:
+
+    return StreamingResponse(
+        _sse_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/summary")
 async def generate_summary(request: SummaryRequest):
@@ -45,7 +89,7 @@ async def generate_summary(request: SummaryRequest):
     rag_service = get_rag_service()
     
     try:
-        result = rag_service.generate_summary(
+        result = await rag_service.agenerate_summary(
             request.subject,
             request.unit,
             request.chapter
@@ -58,6 +102,24 @@ async def generate_summary(request: SummaryRequest):
             detail=f"Error generating summary: {str(e)}"
         )
 
+@router.post("/summary/stream")
+async def stream_summary(request: SummaryRequest):
+
+    file_service = get_file_service()
+    
+    # Check if embeddings exist
+    if not file_service.is_embedding_done(request.subject, request.unit):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No study materials available. Please contact faculty to upload materials."
+        )
+    
+    rag_service = get_rag_service()
+    
+    return _sse_response(
+        rag_service.astream_summary(request.subject, request.unit, request.chapter)
+    )
+
 @router.post("/mcq")
 async def generate_mcq(request: MCQRequest):
 
@@ -71,15 +133,34 @@ async def generate_mcq(request: MCQRequest):
             detail="No study materials available. Please contact faculty to upload materials."
         )
     
+    # Pre-generated questions the student has not seen yet, served instantly
+    mcqs = await _take_from_bank(
+        request.subject, request.unit, "mcq", request.count, request.session_id, request.previous_questions
+    )
+    if len(mcqs) >= request.count:
+        return {
+            "status": "success",
+            "subject": request.subject,
+            "unit": request.unit,
+            "count": len(mcqs),
+            "mcqs": mcqs,
+            "from_bank": True
+        }
+    
     rag_service = get_rag_service()
     
     try:
-        result = rag_service.generate_mcqs(
+        # Only what the bank could not cover is generated live
+        result = await rag_service.agenerate_mcqs(
             request.subject,
             request.unit,
-            request.count,
-            request.previous_questions
+            request.count - len(mcqs),
+            request.session_id,
+            _live_previous("mcq", request.session_id, request.previous_questions, mcqs)
         )
+        if mcqs and result.get("status") == "success":
+            result["mcqs"] = mcqs + result["mcqs"]
+            result["count"] = len(result["mcqs"])
         return result
         
     except Exception as e:
@@ -101,15 +182,33 @@ async def generate_flashcards(request: FlashcardRequest):
             detail="No study materials available. Please contact faculty to upload materials."
         )
     
+    # Pre-generated cards the student has not seen yet, served instantly
+    flashcards = await _take_from_bank(
+        request.subject, request.unit, "flashcards", request.count, request.session_id, request.previous_cards
+    )
+    if len(flashcards) >= request.count:
+        return {
+            "status": "success",
+            "subject": request.subject,
+            "unit": request.unit,
+            "count": len(flashcards),
+            "flashcards": flashcards,
+            "from_bank": True
+        }
+    
     rag_service = get_rag_service()
     
     try:
-        result = rag_service.generate_flashcards(
+        result = await rag_service.agenerate_flashcards(
             request.subject,
             request.unit,
-            request.count,
-            request.previous_cards
+            request.count - len(flashcards),
+            request.session_id,
+            _live_previous("flashcards", request.session_id, request.previous_cards, flashcards)
         )
+        if flashcards and result.get("status") == "success":
+            result["flashcards"] = flashcards + result["flashcards"]
+            result["count"] = len(result["flashcards"])
         return result
         
     except Exception as e:
@@ -134,10 +233,11 @@ async def ask_question(request: AskRequest):
     rag_service = get_rag_service()
     
     try:
-        result = rag_service.ask_question(
+        result = await rag_service.aask_question(
             request.subject,
             request.unit,
-            request.question
+            request.question,
+            retrieval=request.retrieval
         )
         return result
         
@@ -147,6 +247,24 @@ async def ask_question(request: AskRequest):
             detail=f"Error answering question: {str(e)}"
         )
 
+@router.post("/ask/stream")
+async def stream_answer(request: AskRequest):
+
+    file_service = get_file_service()
+    
+    # Check if embeddings exist
+    if not file_service.is_embedding_done(request.subject, request.unit):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No study materials available. Please contact faculty to upload materials."
+        )
+    
+    rag_service = get_rag_service()
+    
+    return _sse_response(
+        rag_service.astream_answer(request.subject, request.unit, request.question, retrieval=request.retrieval)
+    )
+
 @router.get("/subjects")
 async def get_subjects():
 
@@ -1,6 +1,10 @@
 
+import os
 from sentence_transformers import SentenceTransformer
 
+# Pinned copy loaded by the backend without network access (see EMBEDDING_MODEL_DIR)
+MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", "./models/all-MiniLM-L6-v2")
+
 print("=" * 60)
 print("Downloading HuggingFace Embedding Model")
 print("=" * 60)
@@ -17,6 +21,11 @@ try:
     print("\u2705 Model downloaded successfully!")
     print()
     
+    # safetensors can be memory-mapped, which keeps startup fast
+    model.save(MODEL_DIR, safe_serialization=True)
+    print(f"\u2705 Model saved to {os.path.abspath(MODEL_DIR)}")
+    print()
+    
     # Test the model
     print("Testing model...")
     test_embedding = model.encode("This is a test sentence.")
@@ -0,0 +1,143 @@
+
+import os
+import sys
+import json
+import time
+import numpy as np
+
+# Where the exported model is written; HuggingFaceEmbeddings reads ONNX_MODEL_DIR
+MODEL_NAME = "all-MiniLM-L6-v2"
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./models/all-MiniLM-L6-v2-onnx")
+# Lowest acceptable cosine similarity between fp32 and int8 embeddings
+PARITY_MIN_COSINE = float(os.getenv("PARITY_MIN_COSINE", "0.99"))
+
+PARITY_SENTENCES = [
+    "This is a test sentence.",
+    "What is normalization in database management systems?",
+    "Explain the difference between a process and a thread.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "Newton's second law states that force equals mass times acceleration.",
+    "A binary search tree keeps keys in sorted order so lookups take logarithmic time.",
+    "The French Revolution began in 1789 and reshaped European politics for decades.",
+    "Define entropy and give an example from thermodynamics. " * 20
+]
+
+def export_model(output_dir: str):
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    model = SentenceTransformer(MODEL_NAME, device="cpu")
+    transformer = model[0]
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Only the transformer is exported; pooling and normalization run in NumPy
+    class TokenEmbeddings(torch.nn.Module):
+
+        
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+        
+        def forward(self, input_ids, attention_mask, token_type_ids):
+
+            return self.auto_model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids
+            ).last_hidden_state
+    
+    sample = transformer.tokenizer(["export sample"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    dynamic_axes = {
+        name: {0: "batch", 1: "sequence"}
+        for name in ("input_ids", "attention_mask", "token_type_ids", "token_embeddings")
+    }
+    
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer.auto_model).eval(),
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    
+    # Weights to int8, activations quantized on the fly
+    quantize_dynamic(fp32_path, os.path.join(output_dir, "model_quantized.onnx"), weight_type=QuantType.QInt8)
+    
+    transformer.tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, "encoder_config.json"), 'w') as f:
+        json.dump({
+            "model_name": MODEL_NAME,
+            "max_seq_length": transformer.max_seq_length,
+            "dimension": model.get_sentence_embedding_dimension(),
+            "pad_token": transformer.tokenizer.pad_token,
+            "pad_token_id": transformer.tokenizer.pad_token_id,
+            "normalize": any(type(module).__name__ == "Normalize" for module in model)
+        }, f, indent=2)
+    
+    return model
+
+def check_parity(model, output_dir: str) -> bool:
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from utils.onnx_encoder import OnnxSentenceEncoder
+    
+    encoder = OnnxSentenceEncoder(output_dir)
+    reference = model.encode(PARITY_SENTENCES, convert_to_numpy=True, normalize_embeddings=True)
+    quantized = encoder.encode(PARITY_SENTENCES)
+    
+    cosines = np.sum(reference * quantized, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(quantized, axis=1)
+    )
+    print(f"Cosine similarity fp32 vs int8: mean {cosines.mean():.5f}, min {cosines.min():.5f}")
+    
+    # Rough CPU speed comparison on the same sentences
+    batch = PARITY_SENTENCES * 16
+    start = time.perf_counter()
+    model.encode(batch, convert_to_numpy=True)
+    torch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    encoder.encode(batch)
+    onnx_seconds = time.perf_counter() - start
+    print(f"Encoding {len(batch)} sentences: torch {torch_seconds:.2f}s, onnx int8 {onnx_seconds:.2f}s ({torch_seconds / onnx_seconds:.1f}x)")
+    
+    for filename in ("model.onnx", "model_quantized.onnx"):
+        size_mb = os.path.getsize(os.path.join(output_dir, filename)) / (1024 * 1024)
+        print(f"{filename}: {size_mb:.1f} MB")
+    
+    return bool(cosines.min() >= PARITY_MIN_COSINE)
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Exporting Embedding Model to ONNX (int8)")
+    print("=" * 60)
+    print()
+    print(f"Model: {MODEL_NAME}")
+    print(f"Output: {os.path.abspath(ONNX_MODEL_DIR)}")
+    print()
+    
+    try:
+        model = export_model(ONNX_MODEL_DIR)
+        print("✅ Model exported and quantized!")
+        print()
+        
+        print("Checking parity against the fp32 model...")
+        if not check_parity(model, ONNX_MODEL_DIR):
+            print(f"❌ Cosine drift exceeds the allowed minimum of {PARITY_MIN_COSINE}")
+            sys.exit(1)
+        
+        print()
+        print("=" * 60)
+        print("Export Complete!")
+        print("=" * 60)
+        print("Set EMBEDDING_BACKEND=onnx to use the quantized model.")
+        print("Re-ingest units afterwards; files embedded with the previous model are embedded again.")
+    
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        sys.exit(1)
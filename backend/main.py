@@ -1,11 +1,30 @@
+from dotenv import load_dotenv
+
+# Load environment variables (before the imports below read their settings)
+load_dotenv()
+
+from utils.import_profiler import ImportProfiler
+
+# Times the imports below; heavy libraries should only load behind service getters
+import_profiler = ImportProfiler().start()
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from api import auth, faculty, student
-from dotenv import load_dotenv
+from services.job_queue import get_job_queue
+from services.embedding_service import get_embedding_service
+from services.chunk_selector import get_chunk_selector
+from services.session_dedup import get_session_dedup
+from utils.extraction_engine import get_extraction_engine
+from utils.embedding_pool import shutdown_embedding_pool
+from utils.hf_embeddings import warm_up_embeddings, is_embeddings_ready, embeddings_error
+from utils.context_packer import load_tokenizer, packing_stats
 import os
+import threading
 
-# Load environment variables
-load_dotenv()
+import_profiler.stop()
+import_profiler.report()
 
 app = FastAPI(title="AI-Powered Student Learning Assistant")
 
@@ -23,6 +42,27 @@ app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(faculty.router, prefix="/faculty", tags=["Faculty"])
 app.include_router(student.router, prefix="/student", tags=["Student"])
 
+@app.on_event("startup")
+async def start_job_queue():
+    # Resumes embedding jobs interrupted by the previous shutdown
+    get_job_queue().start()
+
+@app.on_event("startup")
+async def warm_up_models():
+    # Load and warm the embedding model in the background; /ready reports when done
+    threading.Thread(target=warm_up_embeddings, name="embedding-warm-up", daemon=True).start()
+
+@app.on_event("startup")
+async def load_context_tokenizer():
+    # Resolve the prompt tokenizer before the first request has to
+    threading.Thread(target=load_tokenizer, name="context-tokenizer", daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    get_job_queue().stop()
+    get_extraction_engine().shutdown()
+    shutdown_embedding_pool()
+
 @app.get("/")
 async def root():
     return {"message": "AI-Powered Student Learning Assistant API"}
@@ -31,6 +71,26 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    # Keep traffic away until the first request would not pay for model loading
+    if not is_embeddings_ready():
+        # Warm-up gave up; tell operators apart from a model still loading
+        if embeddings_error():
+            return JSONResponse(status_code=503, content={"status": "failed", "error": embeddings_error()})
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
+@app.get("/stats")
+async def cache_stats():
+    # Hit rates of the retrieval, embedding and collection caches
+    stats = get_embedding_service().cache_stats()
+    stats["startup_imports"] = import_profiler.stats()
+    stats["context_packing"] = packing_stats()
+    stats["chunk_selector"] = get_chunk_selector().stats()
+    stats["quiz_dedup"] = get_session_dedup().stats()
+    return stats
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
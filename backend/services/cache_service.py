@@ -0,0 +1,119 @@
+
+import os
+import json
+import hashlib
+from typing import Dict, Optional
+from datetime import datetime
+from services.file_service import get_file_service
+from utils.lru_cache import LRUCache
+
+# Number of generated results kept in memory per worker
+RESULT_CACHE_MEMORY_SIZE = int(os.getenv("RESULT_CACHE_MEMORY_SIZE", "256"))
+
+class ResultCache:
+
+    
+    def __init__(self, memory_size: int = RESULT_CACHE_MEMORY_SIZE):
+        self.memory = LRUCache(memory_size)
+    
+    def _make_key(self, subject: str, unit: str, content_type: str, params: Dict, corpus_version: str) -> str:
+
+        payload = json.dumps({
+            "subject": subject,
+            "unit": unit,
+            "content_type": content_type,
+            "params": params,
+            "corpus_version": corpus_version
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _get_cache_file(self, subject: str, unit: str, content_type: str, key: str, corpus_version: str) -> str:
+
+        summaries_path = get_file_service().get_summaries_path(subject, unit)
+        return os.path.join(summaries_path, f"cache_{corpus_version[:16]}_{content_type}_{key}.json")
+    
+    def get(self, subject: str, unit: str, content_type: str, params: Dict) -> Optional[Dict]:
+
+        corpus_version = get_file_service().get_corpus_version(subject, unit)
+        if not corpus_version:
+            return None
+        
+        key = self._make_key(subject, unit, content_type, params, corpus_version)
+        
+        # Memory first, then the unit's summaries/ directory
+        result = self.memory.get(key)
+        if result is not None:
+            return result
+        
+        cache_file = self._get_cache_file(subject, unit, content_type, key, corpus_version)
+        if not os.path.exists(cache_file):
+            return None
+        
+        try:
+            with open(cache_file, 'r') as f:
+                result = json.load(f)["result"]
+        except (OSError, ValueError, KeyError):
+            return None
+        
+        self.memory.set(key, result)
+        return result
+    
+    def set(self, subject: str, unit: str, content_type: str, params: Dict, result: Dict):
+
+        # Only successful generations are worth replaying
+        if result.get("status") != "success":
+            return
+        
+        corpus_version = get_file_service().get_corpus_version(subject, unit)
+        if not corpus_version:
+            return
+        
+        key = self._make_key(subject, unit, content_type, params, corpus_version)
+        self.memory.set(key, result)
+        
+        cache_file = self._get_cache_file(subject, unit, content_type, key, corpus_version)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        
+        # Write atomically so a concurrent reader never sees a partial file
+        tmp_file = f"{cache_file}.tmp{os.getpid()}"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump({
+                    "content_type": content_type,
+                    "params": params,
+                    "corpus_version": corpus_version,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "result": result
+                }, f)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print(f"Error writing result cache {cache_file}: {str(e)}")
+    
+    def invalidate_unit(self, subject: str, unit: str):
+
+        # Entries are keyed by corpus version, so stale ones can never be hit again;
+        # this only reclaims the disk space of results from older versions
+        file_service = get_file_service()
+        summaries_path = file_service.get_summaries_path(subject, unit)
+        if not os.path.exists(summaries_path):
+            return
+        
+        corpus_version = file_service.get_corpus_version(subject, unit) or ""
+        current_prefix = f"cache_{corpus_version[:16]}_"
+        
+        for filename in os.listdir(summaries_path):
+            if filename.startswith("cache_") and not filename.startswith(current_prefix):
+                try:
+                    os.remove(os.path.join(summaries_path, filename))
+                except OSError:
+                    pass
+
+# Global instance
+_result_cache_instance = None
+
+def get_result_cache() -> ResultCache:
+
+    global _result_cache_instance
+    if _result_cache_instance is None:
+        _result_cache_instance = ResultCache()
+    return _result_cache_instance
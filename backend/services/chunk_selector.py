@@ -0,0 +1,122 @@
+
+import os
+import threading
+import numpy as np
+from typing import List, Dict, Optional
+from services.file_service import get_file_service
+from services.embedding_service import get_embedding_service
+from services.vector_store import spherical_kmeans
+from utils.lru_cache import LRUCache
+
+# Chunks sent with one MCQ or flashcard prompt, each from a different cluster
+CHUNK_SELECTOR_CHUNKS = int(os.getenv("CHUNK_SELECTOR_CHUNKS", "8"))
+# Upper bound on topic clusters per unit
+CHUNK_SELECTOR_MAX_CLUSTERS = int(os.getenv("CHUNK_SELECTOR_MAX_CLUSTERS", "24"))
+# Units whose clustering is kept in memory
+CHUNK_SELECTOR_CACHE_SIZE = int(os.getenv("CHUNK_SELECTOR_CACHE_SIZE", "16"))
+
+class UnitClusters:
+
+    
+    def __init__(self, chunks: List[Dict], embeddings: np.ndarray, max_clusters: int = CHUNK_SELECTOR_MAX_CLUSTERS):
+        self.chunks = chunks
+        
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        
+        # Enough clusters that one request spans distinct topics, about sqrt(n) for large units
+        n = len(chunks)
+        k = min(n, max(min(CHUNK_SELECTOR_CHUNKS, max_clusters), int(np.sqrt(n))), max_clusters)
+        centroids, assignments = spherical_kmeans(vectors, k)
+        similarity = np.sum(vectors * centroids[assignments], axis=1)
+        
+        # Members of each cluster, most representative (closest to the centroid) first
+        self.members = []
+        for cluster in range(k):
+            rows = np.flatnonzero(assignments == cluster)
+            if len(rows):
+                self.members.append(rows[np.argsort(-similarity[rows])])
+        
+        # Larger topics come up first in the rotation
+        self.members.sort(key=len, reverse=True)
+        
+        self._cursor = 0
+        self._visits = [0] * len(self.members)
+        self._lock = threading.Lock()
+    
+    def select(self, count: int) -> List[Dict]:
+
+        # Each pick takes the next cluster in the rotation and the next member of
+        # that cluster, so consecutive requests walk across the whole unit
+        rows = []
+        with self._lock:
+            for _ in range(min(count, len(self.chunks))):
+                cluster = self._cursor % len(self.members)
+                self._cursor += 1
+                members = self.members[cluster]
+                row = int(members[self._visits[cluster] % len(members)])
+                self._visits[cluster] += 1
+                if row not in rows:
+                    rows.append(row)
+        
+        # Reading order reads better in the prompt
+        return [self.chunks[row] for row in sorted(rows)]
+    
+    def stats(self) -> Dict:
+
+        return {
+            "chunks": len(self.chunks),
+            "clusters": len(self.members),
+            "chunks_served": self._cursor
+        }
+
+class ChunkSelector:
+
+    
+    def __init__(self, cache_size: int = CHUNK_SELECTOR_CACHE_SIZE):
+        # (subject, unit, corpus version) -> UnitClusters
+        self._units = LRUCache(cache_size)
+        self._lock = threading.Lock()
+    
+    def get_clusters(self, subject: str, unit: str) -> Optional[UnitClusters]:
+
+        corpus_version = get_file_service().get_corpus_version(subject, unit)
+        key = (subject, unit, corpus_version)
+        
+        clusters = self._units.get(key)
+        if clusters is not None:
+            return clusters
+        
+        # One clustering per unit even when several requests arrive together
+        with self._lock:
+            clusters = self._units.get(key)
+            if clusters is None:
+                chunks = get_embedding_service().get_unit_chunks(subject, unit, include_embeddings=True)
+                if not chunks:
+                    return None
+                
+                embeddings = np.stack([chunk.pop("embedding") for chunk in chunks])
+                clusters = UnitClusters(chunks, embeddings)
+                self._units.set(key, clusters)
+        return clusters
+    
+    def select(self, subject: str, unit: str, count: int = CHUNK_SELECTOR_CHUNKS) -> List[Dict]:
+
+        clusters = self.get_clusters(subject, unit)
+        if clusters is None:
+            return []
+        return clusters.select(count)
+    
+    def stats(self) -> Dict:
+
+        return self._units.stats()
+
+# Global instance
+_chunk_selector_instance = None
+
+def get_chunk_selector() -> ChunkSelector:
+
+    global _chunk_selector_instance
+    if _chunk_selector_instance is None:
+        _chunk_selector_instance = ChunkSelector()
+    return _chunk_selector_instance
@@ -1,12 +1,176 @@
 
-import chromadb
-from chromadb.config import Settings
 import os
-from typing import List, Dict, Optional
-from utils.text_extractor import extract_text, chunk_text
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Callable, Iterator
+from utils.text_extractor import iter_chunks, prune_sidecars
+from utils.extraction_engine import get_extraction_engine
 from utils.hf_embeddings import get_embeddings
+from utils.embedding_cache import get_embedding_cache
+from utils.lru_cache import LRUCache
 from services.file_service import get_file_service
-import uuid
+from services.cache_service import get_result_cache
+from services.vector_store import VectorStore, open_vector_store
+from services.keyword_index import KeywordIndex, build_keyword_index, get_index_version, reciprocal_rank_fusion, tokenize
+from datetime import datetime
+
+# Limits for the per-process registry of open unit vector stores
+CHROMA_MAX_OPEN_COLLECTIONS = int(os.getenv("CHROMA_MAX_OPEN_COLLECTIONS", "16"))
+CHROMA_MEMORY_BUDGET_MB = int(os.getenv("CHROMA_MEMORY_BUDGET_MB", "1024"))
+
+# Chunks embedded and written per step while ingesting a document
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# In-process caches for repeated student questions
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+
+# Retrieval for questions: dense (vectors), keyword (BM25), hybrid (both, fused)
+# or auto (keyword alone for short queries it answers confidently, hybrid otherwise)
+RETRIEVAL_MODES = ("dense", "keyword", "hybrid", "auto")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Queries with at most this many terms may skip the embedding pass in auto mode
+KEYWORD_FAST_PATH_MAX_TERMS = int(os.getenv("KEYWORD_FAST_PATH_MAX_TERMS", "3"))
+# ...and only when the best BM25 match scores at least this much; weaker
+# matches are common words or paraphrases that need the dense pass
+KEYWORD_FAST_PATH_MIN_SCORE = float(os.getenv("KEYWORD_FAST_PATH_MIN_SCORE", "8"))
+# Each retriever contributes this many times n_results candidates to the fusion
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "4"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Loaded keyword indexes kept per process
+KEYWORD_INDEX_CACHE_SIZE = int(os.getenv("KEYWORD_INDEX_CACHE_SIZE", "32"))
+
+class CollectionRegistry:
+
+    
+    def __init__(self, max_open: int = CHROMA_MAX_OPEN_COLLECTIONS, memory_budget_mb: int = CHROMA_MEMORY_BUDGET_MB):
+        self.max_open = max_open
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        # collection_name -> {"store", "bytes", "refs", "stale"}, least recently used first
+        self._entries = OrderedDict()
+        # collection_name -> event set once the store being opened or closed is settled
+        self._busy = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def acquire(self, collection_name: str, opener: Callable[[], VectorStore]) -> Iterator[VectorStore]:
+
+        # A store is only closed once no caller holds it; closing a Chroma client
+        # breaks every collection handle taken from it
+        entry = self._checkout(collection_name, opener)
+        try:
+            yield entry["store"]
+        finally:
+            self._release(collection_name, entry)
+    
+    def _checkout(self, collection_name: str, opener: Callable[[], VectorStore]) -> Dict:
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(collection_name)
+                if entry:
+                    entry["refs"] += 1
+                    self._entries.move_to_end(collection_name)
+                    return entry
+                
+                busy = self._busy.get(collection_name)
+                if busy is None:
+                    self._busy[collection_name] = threading.Event()
+                    break
+            # Another thread is opening or closing this unit; never two clients on one path
+            busy.wait()
+        
+        # Opened outside the lock so a slow open does not stall other units
+        closing = []
+        try:
+            store = opener()
+            entry = {"store": store, "bytes": store.estimated_bytes(), "refs": 1, "stale": False}
+            with self._lock:
+                self._entries[collection_name] = entry
+                closing = self._evict()
+        finally:
+            with self._lock:
+                self._busy.pop(collection_name).set()
+            self._close(closing)
+        return entry
+    
+    def _release(self, collection_name: str, entry: Dict):
+
+        closing = []
+        with self._lock:
+            entry["refs"] -= 1
+            if entry["refs"] == 0 and entry["stale"] and self._entries.get(collection_name) is entry:
+                closing.append(self._retire(collection_name))
+            closing.extend(self._evict())
+        self._close(closing)
+    
+    def _retire(self, collection_name: str):
+
+        # Called with the lock held; the name stays busy until the store is closed
+        self._busy[collection_name] = threading.Event()
+        return collection_name, self._entries.pop(collection_name)["store"]
+    
+    def _evict(self) -> List:
+
+        # Keep the most recently used collection even if it alone exceeds the budget;
+        # stores in use are skipped and reconsidered when released
+        closing = []
+        for collection_name in list(self._entries)[:-1]:
+            if len(self._entries) <= self.max_open and sum(entry["bytes"] for entry in self._entries.values()) <= self.memory_budget:
+                break
+            if self._entries[collection_name]["refs"] == 0:
+                closing.append(self._retire(collection_name))
+        return closing
+    
+    def _close(self, closing: List):
+
+        for collection_name, store in closing:
+            try:
+                store.close()
+            finally:
+                with self._lock:
+                    self._busy.pop(collection_name).set()
+    
+    def invalidate(self, collection_name: str):
+
+        # Reopened on next use; a store still in use is closed by its last caller
+        closing = []
+        with self._lock:
+            entry = self._entries.get(collection_name)
+            if entry and entry["refs"]:
+                entry["stale"] = True
+            elif entry:
+                closing.append(self._retire(collection_name))
+        self._close(closing)
+    
+    def stats(self) -> Dict:
+
+        with self._lock:
+            return {
+                "open_collections": list(self._entries.keys()),
+                "in_use": sum(1 for entry in self._entries.values() if entry["refs"]),
+                "estimated_bytes": sum(entry["bytes"] for entry in self._entries.values()),
+                "max_open": self.max_open,
+                "memory_budget_bytes": self.memory_budget
+            }
+
+# Shared by every EmbeddingService in the process
+_collection_registry = CollectionRegistry()
+
+# (model id, normalized query) -> query embedding
+_query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+# (subject, unit, corpus version, normalized query, n_results, mode) -> formatted results
+_retrieval_cache = LRUCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL_SECONDS)
+# (subject, unit, corpus version) -> KeywordIndex
+_keyword_indexes = LRUCache(KEYWORD_INDEX_CACHE_SIZE)
+
+def normalize_query(query: str) -> str:
+
+    # The embedding model is uncased, so case and spacing never change the vector
+    return " ".join(query.lower().split())
 
 class EmbeddingService:
 
@@ -20,27 +184,44 @@ class EmbeddingService:
         # ChromaDB collection names must be alphanumeric with underscores
         return f"{subject}_{unit}".replace(" ", "_").replace("-", "_").lower()
     
+    @contextmanager
     def get_or_create_collection(self, subject: str, unit: str):
 
         collection_name = self.get_collection_name(subject, unit)
         
-        # Create persistent client
-        client = chromadb.PersistentClient(
-            path=os.path.join(self.chroma_base_path, collection_name)
-        )
-        
-        # Get embeddings function
-        embeddings = get_embeddings()
-        
-        # Get or create collection
-        collection = client.get_or_create_collection(
-            name=collection_name,
-            metadata={"subject": subject, "unit": unit}
-        )
-        
-        return collection, embeddings
+        # Reuse the warm store when this unit is already open; the backend
+        # (Chroma or the NumPy index) comes from VECTOR_STORE_BACKEND. The store
+        # stays open until the block exits
+        with _collection_registry.acquire(
+            collection_name,
+            lambda: open_vector_store(
+                collection_name,
+                {"subject": subject, "unit": unit},
+                self.chroma_base_path
+            )
+        ) as collection:
+            # Get embeddings function
+            embeddings = get_embeddings()
+            
+            yield collection, embeddings
+    
+    def get_chunk_ids(self, file_hash: str, chunk_count: int, start: int = 0) -> List[str]:
+
+        # Deterministic, so re-ingesting the same file overwrites instead of duplicating
+        return [f"{file_hash[:16]}_{i}" for i in range(start, start + chunk_count)]
+    
+    def _iter_batches(self, items: Iterator, batch_size: int) -> Iterator[List]:
+
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
     
-    def process_and_embed_documents(self, subject: str, unit: str) -> Dict:
+    def process_and_embed_documents(self, subject: str, unit: str, progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
 
         file_service = get_file_service()
         
@@ -53,61 +234,198 @@ class EmbeddingService:
                 "message": "No documents found for this subject/unit"
             }
         
-        # Get or create collection
-        collection, embeddings = self.get_or_create_collection(subject, unit)
-        
-        total_chunks = 0
-        processed_files = []
+        # Hash every document once; drives both the diff and the corpus version
+        file_hashes = {
+            os.path.basename(doc_path): file_service.compute_file_hash(doc_path)
+            for doc_path in documents
+        }
+        # The embedding model is part of the version, so caches and the question
+        # bank built on vectors of another model are dropped too
+        model_id = get_embeddings().model_id
+        corpus_version = file_service.corpus_version_from_hashes(file_hashes, model_id)
         
-        for doc_path in documents:
-            try:
-                # Extract text
-                text = extract_text(doc_path)
-                
-                if not text:
-                    continue
-                
-                # Chunk text
-                chunks = chunk_text(text, chunk_size=1000, chunk_overlap=200)
+        # Get or create collection, held until the keyword index is built
+        with self.get_or_create_collection(subject, unit) as (collection, embeddings):
+            # Manifest of what is currently embedded: filename -> {sha256, chunks, model_id}
+            manifest = file_service.load_metadata(subject, unit).get("manifest")
+            
+            # Vectors of another model (e.g. after switching EMBEDDING_BACKEND) cannot
+            # be compared with new queries, and a manifest written for another store
+            # (after switching VECTOR_STORE_BACKEND) says nothing about this one; entries
+            # written before either was recorded count as different
+            other_store = any(
+                entry.get("model_id") != model_id or entry.get("store_backend") != collection.backend
+                for entry in (manifest or {}).values()
+            )
+            
+            # Collections built before the manifest used random ids and may hold
+            # duplicates; those and the above start over once
+            if manifest is None or other_store:
+                manifest = {}
+                if collection.count() > 0:
+                    collection.clear()
+            else:
+                expected_count = sum({entry["sha256"]: entry.get("chunks", 0) for entry in manifest.values()}.values())
+                if collection.count() != expected_count:
+                    # A crash leaves the chunks of the file being embedded behind, and may
+                    # lose chunks of one being replaced; only those files are redone
+                    stored_ids = set(collection.ids())
+                    covered_ids = set()
+                    for filename, entry in list(manifest.items()):
+                        chunk_ids = self.get_chunk_ids(entry["sha256"], entry.get("chunks", 0))
+                        if stored_ids.issuperset(chunk_ids):
+                            covered_ids.update(chunk_ids)
+                        else:
+                            manifest.pop(filename)
+                    collection.delete(ids=[chunk_id for chunk_id in stored_ids if chunk_id not in covered_ids])
+            
+            current_hashes = set(file_hashes.values())
+            
+            def delete_file_vectors(filename: str):
+                entry = manifest.pop(filename)
+                # An identical copy under another name shares the same chunk ids
+                if entry["sha256"] in current_hashes and file_hashes.get(filename) != entry["sha256"]:
+                    return
+                if entry.get("chunks"):
+                    collection.delete(ids=self.get_chunk_ids(entry["sha256"], entry["chunks"]))
+            
+            # Drop vectors of files that were removed from the unit
+            removed_files = [filename for filename in manifest if filename not in file_hashes]
+            for filename in removed_files:
+                delete_file_vectors(filename)
+            collection.flush()
+            file_service.save_manifest(subject, unit, manifest)
+            
+            total_chunks = 0
+            processed_files = []
+            skipped_files = []
+            
+            # Unchanged since the last ingest, their vectors are already in place
+            pending_documents = []
+            for doc_path in documents:
+                filename = os.path.basename(doc_path)
+                entry = manifest.get(filename)
+                if entry and entry["sha256"] == file_hashes[filename]:
+                    skipped_files.append(filename)
+                else:
+                    pending_documents.append(doc_path)
+            
+            progress = {"files_total": len(pending_documents), "files_done": 0, "chunks_embedded": 0}
+            if progress_callback:
+                progress_callback(progress)
+            
+            # Documents are extracted in worker processes, ahead of the embedding loop
+            document_streams = get_extraction_engine().iter_documents(
+                pending_documents,
+                {doc_path: file_hashes[os.path.basename(doc_path)] for doc_path in pending_documents}
+            )
+            
+            for doc_path, pieces in document_streams:
+                filename = os.path.basename(doc_path)
+                file_hash = file_hashes[filename]
+                entry = manifest.get(filename)
                 
-                if not chunks:
-                    continue
+                chunk_count = 0
                 
-                # Generate embeddings
-                chunk_embeddings = embeddings.embed_documents(chunks)
-                
-                # Prepare data for ChromaDB
-                ids = [str(uuid.uuid4()) for _ in chunks]
-                metadatas = [
-                    {
-                        "source": os.path.basename(doc_path),
-                        "subject": subject,
-                        "unit": unit,
-                        "chunk_index": i
+                try:
+                    # Changed file, remove its old chunks first
+                    if entry:
+                        delete_file_vectors(filename)
+                    
+                    # Pages stream into the chunker and fixed-size batches of chunks are
+                    # embedded and written as they fill, so memory does not grow with
+                    # the size of the document
+                    chunks = iter_chunks(pieces, chunk_size=1000, chunk_overlap=200)
+                    
+                    for batch in self._iter_batches(chunks, EMBED_BATCH_SIZE):
+                        # Generate embeddings, reusing cached vectors for chunks seen before
+                        batch_embeddings = get_embedding_cache().embed_documents(embeddings, batch, bulk=True)
+                        
+                        # Prepare data for the vector store
+                        ids = self.get_chunk_ids(file_hash, len(batch), start=chunk_count)
+                        metadatas = [
+                            {
+                                "source": filename,
+                                "subject": subject,
+                                "unit": unit,
+                                "chunk_index": chunk_count + i
+                            }
+                            for i in range(len(batch))
+                        ]
+                        
+                        # Upsert so a run interrupted halfway can simply be repeated
+                        collection.upsert(
+                            ids=ids,
+                            embeddings=batch_embeddings,
+                            documents=batch,
+                            metadatas=metadatas
+                        )
+                        
+                        chunk_count += len(batch)
+                        progress["chunks_embedded"] = total_chunks + chunk_count
+                        if progress_callback:
+                            progress_callback(progress)
+                    
+                    manifest[filename] = {
+                        "sha256": file_hash,
+                        "chunks": chunk_count,
+                        "model_id": model_id,
+                        "store_backend": collection.backend,
+                        "embedded_at": datetime.utcnow().isoformat()
                     }
-                    for i in range(len(chunks))
-                ]
+                    
+                    total_chunks += chunk_count
+                    processed_files.append({
+                        "file": filename,
+                        "chunks": chunk_count
+                    })
                 
-                # Add to collection
-                collection.add(
-                    ids=ids,
-                    embeddings=chunk_embeddings,
-                    documents=chunks,
-                    metadatas=metadatas
-                )
+                except Exception as e:
+                    print(f"Error processing {doc_path}: {str(e)}")
+                    
+                    # Do not leave a partial document behind
+                    if chunk_count:
+                        collection.delete(ids=self.get_chunk_ids(file_hash, chunk_count))
                 
-                total_chunks += len(chunks)
-                processed_files.append({
-                    "file": os.path.basename(doc_path),
-                    "chunks": len(chunks)
-                })
+                # Persist after every file so a restarted job resumes where it stopped
+                collection.flush()
+                file_service.save_manifest(subject, unit, manifest)
                 
-            except Exception as e:
-                print(f"Error processing {doc_path}: {str(e)}")
-                continue
+                progress["files_done"] += 1
+                progress["chunks_embedded"] = total_chunks
+                if progress_callback:
+                    progress_callback(progress)
+            
+            # Per-file flushes only append; the store is reorganized once per job
+            collection.compact()
+            
+            # Lexical index over exactly what the store now holds, rebuilt whole;
+            # small next to the embedding work and always consistent with the vectors
+            keyword_index_path = file_service.get_keyword_index_path(subject, unit)
+            if pending_documents or removed_files or get_index_version(keyword_index_path) != corpus_version:
+                try:
+                    all_records = collection.get_all()
+                    build_keyword_index(
+                        keyword_index_path,
+                        all_records["ids"],
+                        all_records["documents"],
+                        all_records["metadatas"],
+                        corpus_version
+                    )
+                except Exception as e:
+                    print(f"Error building keyword index: {str(e)}")
+        
+        # Reopen on next use so the size estimate reflects the new index
+        _collection_registry.invalidate(self.get_collection_name(subject, unit))
+        _retrieval_cache.remove_if(lambda key: key[:2] == (subject, unit))
+        _keyword_indexes.remove_if(lambda key: key[:2] == (subject, unit))
         
         # Mark embedding as done
-        file_service.mark_embedding_done(subject, unit)
+        file_service.mark_embedding_done(subject, unit, corpus_version)
+        
+        # Results generated from the previous corpus are now stale
+        get_result_cache().invalidate_unit(subject, unit)
+        prune_sidecars(file_service.get_extracted_path(subject, unit), file_hashes.values())
         
         return {
             "status": "success",
@@ -115,40 +433,123 @@ class EmbeddingService:
             "unit": unit,
             "total_chunks": total_chunks,
             "processed_files": processed_files,
+            "skipped_files": skipped_files,
+            "removed_files": removed_files,
             "collection_name": self.get_collection_name(subject, unit)
         }
     
-    def query_documents(self, subject: str, unit: str, query: str, n_results: int = 5) -> List[Dict]:
+    def query_documents(self, subject: str, unit: str, query: str, n_results: int = 5, mode: Optional[str] = None) -> List[Dict]:
 
-        collection, embeddings = self.get_or_create_collection(subject, unit)
+        mode = mode or RETRIEVAL_MODE
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        
+        normalized_query = normalize_query(query)
+        corpus_version = get_file_service().get_corpus_version(subject, unit)
         
-        # Generate query embedding
-        query_embedding = embeddings.embed_query(query)
+        # Same question against the same corpus returns the same chunks
+        retrieval_key = (subject, unit, corpus_version, normalized_query, n_results, mode)
+        cached_results = _retrieval_cache.get(retrieval_key) if corpus_version else None
+        if cached_results is not None:
+            return [dict(result) for result in cached_results]
         
-        # Query collection
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+        if mode == "dense":
+            formatted_results = self._dense_search(subject, unit, normalized_query, n_results)
+        elif mode == "keyword":
+            formatted_results = self._keyword_search(subject, unit, corpus_version, normalized_query, n_results)
+        else:
+            candidates = n_results * HYBRID_CANDIDATE_FACTOR
+            keyword_results = self._keyword_search(subject, unit, corpus_version, normalized_query, candidates)
+            
+            # Short queries the index answers in full with a strong match skip the
+            # embedding pass; hit counts alone would let any common word through
+            if (
+                mode == "auto"
+                and len(tokenize(normalized_query, expand=False)) <= KEYWORD_FAST_PATH_MAX_TERMS
+                and len(keyword_results) >= n_results
+                and keyword_results[0]["bm25"] >= KEYWORD_FAST_PATH_MIN_SCORE
+            ):
+                formatted_results = keyword_results[:n_results]
+            else:
+                dense_results = self._dense_search(subject, unit, normalized_query, candidates)
+                formatted_results = reciprocal_rank_fusion([dense_results, keyword_results], n_results, RRF_K)
         
-        # Format results
-        formatted_results = []
-        if results and results['documents'] and len(results['documents']) > 0:
-            for i in range(len(results['documents'][0])):
-                formatted_results.append({
-                    "content": results['documents'][0][i],
-                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
-                    "distance": results['distances'][0][i] if results.get('distances') else None
-                })
+        if corpus_version:
+            _retrieval_cache.set(retrieval_key, [dict(result) for result in formatted_results])
         
         return formatted_results
     
-    def get_all_documents_content(self, subject: str, unit: str) -> str:
+    def _dense_search(self, subject: str, unit: str, normalized_query: str, n_results: int) -> List[Dict]:
+
+        with self.get_or_create_collection(subject, unit) as (collection, embeddings):
+            # Generate query embedding, reusing it across units and sessions
+            embedding_key = (embeddings.model_id, normalized_query)
+            query_embedding = _query_embedding_cache.get(embedding_key)
+            if query_embedding is None:
+                query_embedding = embeddings.embed_query(normalized_query)
+                _query_embedding_cache.set(embedding_key, query_embedding)
+            
+            # Query collection
+            return collection.query(query_embedding, n_results)
+    
+    def get_keyword_index(self, subject: str, unit: str, corpus_version: Optional[str]) -> Optional[KeywordIndex]:
+
+        key = (subject, unit, corpus_version)
+        keyword_index = _keyword_indexes.get(key)
+        if keyword_index is None:
+            path = get_file_service().get_keyword_index_path(subject, unit)
+            if not os.path.exists(path):
+                return None
+            keyword_index = KeywordIndex(path)
+            _keyword_indexes.set(key, keyword_index)
+        return keyword_index
+    
+    def _keyword_search(self, subject: str, unit: str, corpus_version: Optional[str], normalized_query: str, n_results: int) -> List[Dict]:
+
+        try:
+            keyword_index = self.get_keyword_index(subject, unit, corpus_version)
+        except Exception as e:
+            # Units ingested before the keyword index existed fall back to vectors alone
+            print(f"Error loading keyword index: {str(e)}")
+            return []
+        
+        if keyword_index is None:
+            return []
+        return keyword_index.search(normalized_query, n_results)
+    
+    def cache_stats(self) -> Dict:
 
-        collection, _ = self.get_or_create_collection(subject, unit)
+        return {
+            "query_embeddings": _query_embedding_cache.stats(),
+            "retrieval": _retrieval_cache.stats(),
+            "keyword_indexes": _keyword_indexes.stats(),
+            "results": get_result_cache().memory.stats(),
+            "embedding_cache": get_embedding_cache().stats(),
+            "collections": _collection_registry.stats()
+        }
+    
+    def get_unit_chunks(self, subject: str, unit: str, include_embeddings: bool = False) -> List[Dict]:
+
+        with self.get_or_create_collection(subject, unit) as (collection, _):
+            results = collection.get_all(include_embeddings=include_embeddings)
         
+        chunks = [
+            {"id": chunk_id, "content": document, "metadata": metadata or {}}
+            for chunk_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+        if include_embeddings:
+            for chunk, embedding in zip(chunks, results["embeddings"]):
+                chunk["embedding"] = embedding
+        
+        # Stores return chunks in no particular order; restore reading order
+        chunks.sort(key=lambda chunk: (chunk["metadata"].get("source", ""), chunk["metadata"].get("chunk_index", 0)))
+        return chunks
+    
+    def get_all_documents_content(self, subject: str, unit: str) -> str:
+
         # Get all documents from collection
-        results = collection.get()
+        with self.get_or_create_collection(subject, unit) as (collection, _):
+            results = collection.get_all()
         
         if results and results['documents']:
             # Concatenate all chunks
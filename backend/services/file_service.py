@@ -2,8 +2,10 @@
 import os
 import json
 import shutil
+import hashlib
 from typing import Optional, Dict, List
 from datetime import datetime
+from utils.text_extractor import compute_file_hash
 
 class FileService:
 
@@ -25,6 +27,14 @@ class FileService:
 
         return os.path.join(self.get_subject_unit_path(subject, unit), "embeddings")
     
+    def get_extracted_path(self, subject: str, unit: str) -> str:
+
+        return os.path.join(self.get_subject_unit_path(subject, unit), "extracted")
+    
+    def get_keyword_index_path(self, subject: str, unit: str) -> str:
+
+        return os.path.join(self.get_subject_unit_path(subject, unit), "keyword_index")
+    
     def get_summaries_path(self, subject: str, unit: str) -> str:
 
         return os.path.join(self.get_subject_unit_path(subject, unit), "summaries")
@@ -70,7 +80,9 @@ class FileService:
                     shutil.rmtree(embeddings_path)
                     os.makedirs(embeddings_path, exist_ok=True)
                 
-                # Reset metadata
+                # Reset metadata, keeping the embedding manifest so the next
+                # ingest knows which vectors belong to the removed files
+                previous_metadata = self.load_metadata(subject, unit)
                 metadata = {
                     "subject": subject,
                     "unit": unit,
@@ -79,6 +91,8 @@ class FileService:
                     "documents": [],
                     "replaced_at": datetime.utcnow().isoformat()
                 }
+                if "manifest" in previous_metadata:
+                    metadata["manifest"] = previous_metadata["manifest"]
                 self.save_metadata(subject, unit, metadata)
         
         filename = os.path.basename(file_path)
@@ -157,11 +171,45 @@ class FileService:
         metadata = self.load_metadata(subject, unit)
         return metadata.get("embedding_done", False)
     
-    def mark_embedding_done(self, subject: str, unit: str):
+    def mark_embedding_done(self, subject: str, unit: str, corpus_version: Optional[str] = None):
 
         metadata = self.load_metadata(subject, unit)
         metadata["embedding_done"] = True
         metadata["embedding_completed_at"] = datetime.utcnow().isoformat()
+        if corpus_version:
+            metadata["corpus_version"] = corpus_version
+        self.save_metadata(subject, unit, metadata)
+    
+    def get_corpus_version(self, subject: str, unit: str) -> Optional[str]:
+
+        return self.load_metadata(subject, unit).get("corpus_version")
+    
+    def compute_file_hash(self, file_path: str) -> str:
+
+        return compute_file_hash(file_path)
+    
+    def corpus_version_from_hashes(self, file_hashes: Dict[str, str], model_id: str = "") -> str:
+
+        # Changes whenever any document in the unit is added, removed or edited,
+        # or the unit is embedded with another model
+        sha256 = hashlib.sha256()
+        sha256.update(model_id.encode("utf-8"))
+        for filename in sorted(file_hashes):
+            sha256.update(filename.encode("utf-8"))
+            sha256.update(file_hashes[filename].encode("utf-8"))
+        return sha256.hexdigest()
+    
+    def compute_corpus_version(self, subject: str, unit: str, model_id: str = "") -> str:
+
+        return self.corpus_version_from_hashes({
+            os.path.basename(file_path): self.compute_file_hash(file_path)
+            for file_path in self.get_all_documents(subject, unit)
+        }, model_id)
+    
+    def save_manifest(self, subject: str, unit: str, manifest: Dict):
+
+        metadata = self.load_metadata(subject, unit)
+        metadata["manifest"] = manifest
         self.save_metadata(subject, unit, metadata)
     
     def get_all_subjects(self) -> List[str]:
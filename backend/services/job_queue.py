@@ -0,0 +1,270 @@
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Dict, Optional
+from datetime import datetime
+from services.embedding_service import get_embedding_service
+from services.question_bank import get_question_bank
+
+# Embedding jobs survive restarts in this SQLite file
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "./jobs.db")
+EMBEDDING_JOB_WORKERS = int(os.getenv("EMBEDDING_JOB_WORKERS", "1"))
+# A running job is renewed by its process every third of this; once it lapses
+# (the process died) any process may pick the job up again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+class JobQueue:
+
+    
+    def __init__(self, db_path: str = JOB_QUEUE_PATH, workers: int = EMBEDDING_JOB_WORKERS):
+        self.db_path = db_path
+        self.workers = workers
+        self._threads = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        # Recorded on the jobs this process runs; several workers share the file
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    subject TEXT NOT NULL,
+                    unit TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    files_total INTEGER DEFAULT 0,
+                    files_done INTEGER DEFAULT 0,
+                    chunks_embedded INTEGER DEFAULT 0,
+                    error TEXT,
+                    result TEXT,
+                    owner TEXT,
+                    lease_expires_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+            
+            # Files created before leases existed
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "lease_expires_at" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+    
+    def _connect(self) -> sqlite3.Connection:
+
+        # isolation_level=None lets us issue BEGIN IMMEDIATE ourselves
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def enqueue(self, subject: str, unit: str) -> Dict:
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            
+            # A job that has not started yet will pick up this upload too
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE subject = ? AND unit = ? AND status = 'queued'",
+                (subject, unit)
+            ).fetchone()
+            
+            if row:
+                job_id = row["id"]
+            else:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, subject, unit, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                    (job_id, subject, unit, datetime.utcnow().isoformat())
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        
+        with self._wakeup:
+            self._wakeup.notify()
+        
+        return self.get_job(job_id)
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        
+        if not row:
+            return None
+        
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        
+        # Estimate time remaining from the average time per finished file
+        eta_seconds = None
+        if job["status"] == "running" and job["started_at"] and job["files_done"] > 0:
+            elapsed = (datetime.utcnow() - datetime.fromisoformat(job["started_at"])).total_seconds()
+            remaining = max(job["files_total"] - job["files_done"], 0)
+            eta_seconds = round(elapsed / job["files_done"] * remaining, 1)
+        
+        job["progress"] = {
+            "files_total": job.pop("files_total"),
+            "files_done": job.pop("files_done"),
+            "chunks_embedded": job.pop("chunks_embedded"),
+            "eta_seconds": eta_seconds
+        }
+        return job
+    
+    def _claim_next(self) -> Optional[Dict]:
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            
+            # Running jobs whose process stopped renewing the lease are queued again;
+            # ingestion is idempotent so repeating the finished part is safe
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL WHERE status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                (time.time(),)
+            )
+            
+            # Oldest queued job whose unit is not already being embedded
+            row = conn.execute("""
+                SELECT * FROM jobs AS queued
+                WHERE status = 'queued'
+                AND NOT EXISTS (
+                    SELECT 1 FROM jobs AS running
+                    WHERE running.status = 'running'
+                    AND running.subject = queued.subject
+                    AND running.unit = queued.unit
+                )
+                ORDER BY created_at
+                LIMIT 1
+            """).fetchone()
+            
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, owner = ?, lease_expires_at = ? WHERE id = ?",
+                    (datetime.utcnow().isoformat(), self.owner, time.time() + JOB_LEASE_SECONDS, row["id"])
+                )
+            conn.execute("COMMIT")
+            return dict(row) if row else None
+        finally:
+            conn.close()
+    
+    def _renew_lease(self, job_id: str):
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = 'running' AND owner = ?",
+                (time.time() + JOB_LEASE_SECONDS, job_id, self.owner)
+            )
+    
+    def _heartbeat(self, job_id: str, finished: threading.Event):
+
+        # Separate from progress updates, a single large file can take longer than the lease
+        while not finished.wait(JOB_LEASE_SECONDS / 3):
+            try:
+                self._renew_lease(job_id)
+            except Exception as e:
+                print(f"Error renewing lease of embedding job {job_id}: {str(e)}")
+    
+    def _update_progress(self, job_id: str, progress: Dict):
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET files_total = ?, files_done = ?, chunks_embedded = ? WHERE id = ?",
+                (progress["files_total"], progress["files_done"], progress["chunks_embedded"], job_id)
+            )
+    
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+
+        with closing(self._connect()) as conn:
+            # A job another process took over after our lease lapsed is left to it
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, lease_expires_at = NULL WHERE id = ? AND owner = ?",
+                (status, datetime.utcnow().isoformat(), json.dumps(result) if result else None, error, job_id, self.owner)
+            )
+    
+    def _run_job(self, job: Dict):
+
+        embedding_service = get_embedding_service()
+        
+        finished = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job["id"], finished), name=f"embedding-lease-{job['id']}", daemon=True).start()
+        
+        try:
+            result = embedding_service.process_and_embed_documents(
+                job["subject"],
+                job["unit"],
+                progress_callback=lambda progress: self._update_progress(job["id"], progress)
+            )
+            status = "done" if result.get("status") == "success" else "failed"
+            self._finish(job["id"], status, result=result, error=result.get("message"))
+            
+            # Quiz items for the new corpus are generated in the background
+            if status == "done":
+                get_question_bank().schedule_fill(job["subject"], job["unit"])
+        except Exception as e:
+            print(f"Error running embedding job {job['id']}: {str(e)}")
+            self._finish(job["id"], "failed", error=str(e))
+        finally:
+            finished.set()
+        
+        # A finished job may unblock a queued one for the same unit
+        with self._wakeup:
+            self._wakeup.notify_all()
+    
+    def _worker_loop(self):
+
+        while not self._stopping:
+            job = self._claim_next()
+            if job:
+                self._run_job(job)
+                continue
+            
+            # Poll as well, other processes may enqueue into the same file
+            with self._wakeup:
+                self._wakeup.wait(timeout=2)
+    
+    def start(self):
+
+        if self._threads:
+            return
+        
+        # Jobs of other processes keep running; only a job recorded under this
+        # process's own host and pid belongs to a predecessor that died (a
+        # restarted container reuses the pid) and can be picked up at once.
+        # Everything else waits for its lease to lapse in _claim_next
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET status = 'queued', owner = NULL WHERE status = 'running' AND owner = ?", (self.owner,))
+        
+        self._stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"embedding-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self):
+
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        self._threads = []
+
+# Global instance
+_job_queue_instance = None
+
+def get_job_queue() -> JobQueue:
+
+    global _job_queue_instance
+    if _job_queue_instance is None:
+        _job_queue_instance = JobQueue()
+    return _job_queue_instance
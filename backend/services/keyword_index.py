@@ -0,0 +1,187 @@
+
+import os
+import re
+import json
+import math
+import shutil
+import numpy as np
+from collections import Counter
+from typing import List, Dict, Optional
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Keeps formula names, acronyms and section numbers like "3.2.1", "k-means", "h2o" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can could did do does for from had has have how i if in into is it its
+me my of on or our so than that the their them then there these they this to was we were what when
+where which who why will with would you your explain define describe tell about please give
+""".split())
+
+def tokenize(text: str, expand: bool = True) -> List[str]:
+
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        
+        # Compound tokens are also indexed by their parts, so "k-means" matches "means"
+        if expand and any(separator in token for separator in "._-/"):
+            tokens.extend(part for part in re.split(r"[._\-/]", token) if part and part not in STOPWORDS)
+    return tokens
+
+def build_keyword_index(path: str, ids: List[str], documents: List[str], metadatas: List[Dict], corpus_version: Optional[str] = None):
+
+    # Postings are stored term by term as two flat arrays (chunk row, term
+    # frequency) that are memory-mapped at query time; the vocabulary maps each
+    # term to its slice
+    term_postings = {}
+    doc_lengths = np.zeros(len(documents), dtype=np.uint32)
+    for row, document in enumerate(documents):
+        counts = Counter(tokenize(document))
+        doc_lengths[row] = sum(counts.values())
+        for term, tf in counts.items():
+            term_postings.setdefault(term, []).append((row, tf))
+    
+    vocabulary = {}
+    postings_docs = np.empty(sum(len(postings) for postings in term_postings.values()), dtype=np.uint32)
+    postings_tf = np.empty(len(postings_docs), dtype=np.uint16)
+    position = 0
+    for term in sorted(term_postings):
+        postings = term_postings[term]
+        postings_docs[position:position + len(postings)] = [row for row, _ in postings]
+        postings_tf[position:position + len(postings)] = [min(tf, 65535) for _, tf in postings]
+        vocabulary[term] = [position, position + len(postings)]
+        position += len(postings)
+    
+    # Built next to the live index and swapped in whole
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    
+    np.save(os.path.join(tmp_path, "postings_docs.npy"), postings_docs)
+    np.save(os.path.join(tmp_path, "postings_tf.npy"), postings_tf)
+    np.save(os.path.join(tmp_path, "doc_lengths.npy"), doc_lengths)
+    
+    offsets = [0]
+    with open(os.path.join(tmp_path, "docs.jsonl"), 'wb') as f:
+        for record_id, document, metadata in zip(ids, documents, metadatas):
+            line = (json.dumps({"id": record_id, "document": document, "metadata": metadata}) + "\n").encode("utf-8")
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(tmp_path, "doc_offsets.npy"), np.array(offsets, dtype=np.int64))
+    
+    with open(os.path.join(tmp_path, "vocabulary.json"), 'w') as f:
+        json.dump(vocabulary, f)
+    with open(os.path.join(tmp_path, "meta.json"), 'w') as f:
+        json.dump({
+            "num_docs": len(documents),
+            "avg_doc_length": float(doc_lengths.mean()) if len(documents) else 0.0,
+            "corpus_version": corpus_version
+        }, f)
+    
+    old_path = f"{path}.old{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+def get_index_version(path: str) -> Optional[str]:
+
+    try:
+        with open(os.path.join(path, "meta.json"), 'r') as f:
+            return json.load(f).get("corpus_version")
+    except (OSError, ValueError):
+        return None
+
+class KeywordIndex:
+
+    
+    def __init__(self, path: str, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        
+        with open(os.path.join(path, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        with open(os.path.join(path, "vocabulary.json"), 'r') as f:
+            self.vocabulary = json.load(f)
+        
+        self.num_docs = meta["num_docs"]
+        self.avg_doc_length = meta["avg_doc_length"] or 1.0
+        self.corpus_version = meta.get("corpus_version")
+        
+        # Postings stay on disk; only the slices of the query terms are paged in
+        self.postings_docs = np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r")
+        self.postings_tf = np.load(os.path.join(path, "postings_tf.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(path, "doc_lengths.npy")).astype(np.float32)
+        self.doc_offsets = np.load(os.path.join(path, "doc_offsets.npy"))
+    
+    def _read_docs(self, rows) -> List[Dict]:
+
+        records = []
+        with open(os.path.join(self.path, "docs.jsonl"), 'rb') as f:
+            for row in rows:
+                f.seek(int(self.doc_offsets[row]))
+                records.append(json.loads(f.read(int(self.doc_offsets[row + 1] - self.doc_offsets[row]))))
+        return records
+    
+    def search(self, query: str, n_results: int) -> List[Dict]:
+
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self.vocabulary]
+        if not terms or self.num_docs == 0:
+            return []
+        
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / self.avg_doc_length)
+        
+        for term in terms:
+            start, end = self.vocabulary[term]
+            rows = np.asarray(self.postings_docs[start:end], dtype=np.int64)
+            tf = np.asarray(self.postings_tf[start:end], dtype=np.float32)
+            df = end - start
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + length_norm[rows])
+        
+        matched = np.flatnonzero(scores)
+        k = min(n_results, len(matched))
+        if k == 0:
+            return []
+        
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        
+        return [
+            {
+                "id": record["id"],
+                "content": record["document"],
+                "metadata": record["metadata"],
+                "distance": None,
+                "bm25": float(scores[row])
+            }
+            for row, record in zip(top, self._read_docs(top))
+        ]
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], n_results: int, k: int = 60) -> List[Dict]:
+
+    # Each list contributes 1 / (k + rank); chunks found by both rise to the top
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            key = result.get("id") or result["content"]
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = dict(result, rrf_score=0.0)
+            else:
+                # Keep whichever scores each retriever reported
+                for field, value in result.items():
+                    if entry.get(field) is None:
+                        entry[field] = value
+            entry["rrf_score"] += 1.0 / (k + rank + 1)
+    
+    ranked = sorted(fused.values(), key=lambda entry: entry["rrf_score"], reverse=True)
+    return ranked[:n_results]
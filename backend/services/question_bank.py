@@ -0,0 +1,226 @@
+
+import os
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable
+from datetime import datetime
+from services.file_service import get_file_service
+
+# Pre-generated MCQs and flashcards, per unit and corpus version
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "./question_bank.db")
+# Items of each kind generated after an ingest, and added per refill
+QUESTION_BANK_TARGET = int(os.getenv("QUESTION_BANK_TARGET", "30"))
+# Refill once a student has fewer unseen items than this
+QUESTION_BANK_LOW_WATER = int(os.getenv("QUESTION_BANK_LOW_WATER", "10"))
+# The bank stops growing here; beyond it requests fall back to live generation
+QUESTION_BANK_MAX = int(os.getenv("QUESTION_BANK_MAX", "200"))
+# Items asked of the LLM per call, and calls in flight during a fill
+QUESTION_BANK_BATCH_SIZE = int(os.getenv("QUESTION_BANK_BATCH_SIZE", "5"))
+QUESTION_BANK_CONCURRENCY = int(os.getenv("QUESTION_BANK_CONCURRENCY", "4"))
+# Times take() tops up candidates its caller turned down
+QUESTION_BANK_TAKE_ROUNDS = int(os.getenv("QUESTION_BANK_TAKE_ROUNDS", "3"))
+
+BANK_KINDS = ("mcq", "flashcards")
+
+def item_key(kind: str, item: Dict) -> str:
+
+    # What the frontend sends back as already seen: the question, or the card front
+    text = item["question"] if kind == "mcq" else item["front"]
+    return " ".join(text.lower().split())
+
+class QuestionBank:
+
+    
+    def __init__(self, db_path: str = QUESTION_BANK_PATH):
+        self.db_path = db_path
+        # (subject, unit, kind) being filled by this process
+        self._filling = set()
+        self._filling_lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS bank_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    subject TEXT NOT NULL,
+                    unit TEXT NOT NULL,
+                    corpus_version TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    item_key TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    served INTEGER DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    UNIQUE (subject, unit, corpus_version, kind, item_key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bank_unit ON bank_items(subject, unit, corpus_version, kind)")
+    
+    def _connect(self) -> sqlite3.Connection:
+
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def count(self, subject: str, unit: str, kind: str, corpus_version: Optional[str] = None) -> int:
+
+        corpus_version = corpus_version or get_file_service().get_corpus_version(subject, unit)
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n FROM bank_items WHERE subject = ? AND unit = ? AND corpus_version = ? AND kind = ?",
+                (subject, unit, corpus_version, kind)
+            ).fetchone()
+        return row["n"]
+    
+    def take(self, subject: str, unit: str, kind: str, count: int, seen: Optional[List[str]] = None, accept: Optional[Callable[[List[Dict]], List[Dict]]] = None) -> List[Dict]:
+
+        corpus_version = get_file_service().get_corpus_version(subject, unit)
+        if not corpus_version:
+            return []
+        
+        seen_keys = {" ".join(text.lower().split()) for text in seen or []}
+        
+        # Least served first, so students spread over the whole bank
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                """
+                SELECT id, item_key, item, chunk_ids FROM bank_items
+                WHERE subject = ? AND unit = ? AND corpus_version = ? AND kind = ?
+                ORDER BY served, id
+                """,
+                (subject, unit, corpus_version, kind)
+            ).fetchall()
+        unseen = [row for row in rows if row["item_key"] not in seen_keys]
+        
+        # accept() (the session's near-duplicate filter) may turn candidates down;
+        # those are replaced by the next ones and are not counted as served.
+        # Whatever the bank cannot cover is left to live generation
+        items = []
+        served_ids = []
+        position = 0
+        for _ in range(QUESTION_BANK_TAKE_ROUNDS):
+            block = unseen[position:position + count - len(items)]
+            if not block:
+                break
+            position += len(block)
+            
+            candidates = {}
+            for row in block:
+                item = json.loads(row["item"])
+                item["chunk_ids"] = json.loads(row["chunk_ids"])
+                candidates[id(item)] = (row["id"], item)
+            
+            kept = accept([item for _, item in candidates.values()]) if accept else [item for _, item in candidates.values()]
+            items.extend(kept)
+            served_ids.extend(candidates[id(item)][0] for item in kept)
+            if len(items) >= count:
+                break
+        
+        if served_ids:
+            with closing(self._connect()) as conn:
+                conn.executemany("UPDATE bank_items SET served = served + 1 WHERE id = ?", [(row_id,) for row_id in served_ids])
+        
+        if len(unseen) - position < QUESTION_BANK_LOW_WATER and len(rows) < QUESTION_BANK_MAX:
+            self.schedule_fill(subject, unit, [kind], grow=True)
+        
+        return items
+    
+    def _add(self, subject: str, unit: str, corpus_version: str, kind: str, items: List[Dict], chunk_ids: List[str]) -> int:
+
+        now = datetime.utcnow().isoformat()
+        with closing(self._connect()) as conn:
+            before = conn.total_changes
+            # The same question generated twice is stored once
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO bank_items (subject, unit, corpus_version, kind, item_key, item, chunk_ids, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (subject, unit, corpus_version, kind, item_key(kind, item), json.dumps(item), json.dumps(chunk_ids), now)
+                    for item in items
+                ]
+            )
+            return conn.total_changes - before
+    
+    def prune(self, subject: str, unit: str, corpus_version: str):
+
+        # Items generated from an older corpus are never served again
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "DELETE FROM bank_items WHERE subject = ? AND unit = ? AND corpus_version != ?",
+                (subject, unit, corpus_version)
+            )
+    
+    def fill(self, subject: str, unit: str, kinds=BANK_KINDS, grow: bool = False) -> Dict:
+
+        from services.rag_service import get_rag_service
+        
+        corpus_version = get_file_service().get_corpus_version(subject, unit)
+        if not corpus_version:
+            return {"status": "error", "message": "Unit has no embedded corpus"}
+        
+        self.prune(subject, unit, corpus_version)
+        rag_service = get_rag_service()
+        added = {}
+        
+        for kind in kinds:
+            # After an ingest the bank is brought up to the target; students running
+            # low grow it by another target's worth
+            current = self.count(subject, unit, kind, corpus_version)
+            target = min(current + QUESTION_BANK_TARGET if grow else QUESTION_BANK_TARGET, QUESTION_BANK_MAX)
+            batches = -(-(target - current) // QUESTION_BANK_BATCH_SIZE)
+            if batches <= 0:
+                added[kind] = 0
+                continue
+            
+            # Each call gets its own rotation of chunks, so batches cover different topics
+            with ThreadPoolExecutor(max_workers=QUESTION_BANK_CONCURRENCY) as executor:
+                results = list(executor.map(
+                    lambda _: rag_service.generate_bank_items(subject, unit, kind, QUESTION_BANK_BATCH_SIZE),
+                    range(batches)
+                ))
+            
+            added[kind] = 0
+            for result in results:
+                if result.get("status") != "success":
+                    print(f"Error generating {kind} for the question bank: {result.get('message')}")
+                    continue
+                # The corpus may have changed while generating; store under the version used
+                added[kind] += self._add(subject, unit, corpus_version, kind, result["items"], result["chunk_ids"])
+        
+        return {"status": "success", "subject": subject, "unit": unit, "added": added}
+    
+    def schedule_fill(self, subject: str, unit: str, kinds=BANK_KINDS, grow: bool = False):
+
+        # One fill per unit and kind at a time, so a refill of one kind is not
+        # lost behind a running fill of another; a student never waits for it
+        with self._filling_lock:
+            kinds = [kind for kind in kinds if (subject, unit, kind) not in self._filling]
+            if not kinds:
+                return
+            self._filling.update((subject, unit, kind) for kind in kinds)
+        
+        def run():
+            try:
+                self.fill(subject, unit, kinds, grow)
+            except Exception as e:
+                print(f"Error filling question bank for {subject}/{unit}: {str(e)}")
+            finally:
+                with self._filling_lock:
+                    self._filling.difference_update((subject, unit, kind) for kind in kinds)
+        
+        threading.Thread(target=run, name=f"question-bank-{subject}-{unit}-{'-'.join(kinds)}", daemon=True).start()
+
+# Global instance
+_question_bank_instance = None
+
+def get_question_bank() -> QuestionBank:
+
+    global _question_bank_instance
+    if _question_bank_instance is None:
+        _question_bank_instance = QuestionBank()
+    return _question_bank_instance
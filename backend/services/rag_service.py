@@ -1,21 +1,40 @@
-
 import os
-from typing import List, Dict, Optional
-from langchain_groq import ChatGroq
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import uuid
+import asyncio
+from typing import List, Dict, Optional, AsyncIterator, TYPE_CHECKING
 from services.embedding_service import get_embedding_service
+from services.cache_service import get_result_cache
+from services.summarizer import MapReduceSummarizer
+from services.chunk_selector import get_chunk_selector
+from services.session_dedup import get_session_dedup
+from utils.context_packer import pack_chunks, CONTEXT_TOKENS_ASK, CONTEXT_TOKENS_SUMMARY, CONTEXT_TOKENS_QUIZ
+from utils.llm_limiter import LLMLimiter
 import json
 import re
 from dotenv import load_dotenv
 
+# langchain is imported when the service is first used, not at API startup
+if TYPE_CHECKING:
+    from langchain_core.prompts import PromptTemplate
+
 # Load environment variables
 load_dotenv()
 
+# Maximum number of LLM calls a single worker keeps in flight at once
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Generation rounds per quiz request while near-duplicates are being replaced
+QUIZ_DEDUP_MAX_ROUNDS = int(os.getenv("QUIZ_DEDUP_MAX_ROUNDS", "3"))
+
+# Response field holding the items of each quiz kind
+QUIZ_RESULT_KEYS = {"mcq": "mcqs", "flashcards": "flashcards"}
+
 class RAGService:
 
     
     def __init__(self):
+        from langchain_groq import ChatGroq
+        from langchain_core.output_parsers import StrOutputParser
+        
         # Initialize Groq LLM
         groq_api_key = os.getenv("GROQ_API_KEY")
         if not groq_api_key:
@@ -29,26 +48,94 @@ class RAGService:
             model="llama-3.3-70b-versatile",  # Updated to current supported model
             temperature=0.7
         )
-    
-    def generate_summary(self, subject: str, unit: str, chapter: Optional[str] = None) -> Dict:
-
-        embedding_service = get_embedding_service()
         
-        # Get all documents content
-        content = embedding_service.get_all_documents_content(subject, unit)
+        self._output_parser = StrOutputParser()
+        
+        # Bounds concurrent LLM calls so a burst of students cannot open an
+        # unbounded number of Groq requests from one worker; shared by requests
+        # on the event loop and background threads such as question bank fills
+        self._llm_limiter = LLMLimiter(LLM_MAX_CONCURRENCY)
         
-        if not content:
+        self._summarizer = MapReduceSummarizer(self.llm, self._output_parser, self._invoke, self._ainvoke)
+    
+    def _invoke(self, chain, inputs: Dict) -> str:
+
+        with self._llm_limiter:
+            return chain.invoke(inputs)
+    
+    async def _ainvoke(self, chain, inputs: Dict) -> str:
+
+        async with self._llm_limiter:
+            return await chain.ainvoke(inputs)
+    
+    async def _astream(self, chain, inputs: Dict) -> AsyncIterator[str]:
+
+        # The slot is held for the whole generation, not just the first token
+        async with self._llm_limiter:
+            async for token in chain.astream(inputs):
+                yield token
+    
+    def _context_report(self, packed: Dict) -> Dict:
+
+        return {
+            "packed_tokens": packed["packed_tokens"],
+            "dropped_tokens": packed["dropped_tokens"],
+            "dropped_chunks": packed["dropped_chunks"],
+            "budget": packed["budget"]
+        }
+    
+    def _get_unit_content(self, subject: str, unit: str, budget: int) -> Dict:
+
+        # A few chunks from different topic clusters, rotating across requests
+        # so successive quizzes cover the whole unit
+        chunks = get_chunk_selector().select(subject, unit)
+        packed = pack_chunks([chunk["content"] for chunk in chunks], budget)
+        packed["chunk_ids"] = [chunks[i]["id"] for i in packed["indices"]]
+        return packed
+    
+    def generate_bank_items(self, subject: str, unit: str, kind: str, count: int) -> Dict:
+
+        # Uncached generation for the question bank, tagged with the chunks it came from
+        try:
+            return self._quiz_round(subject, unit, kind, count, use_cache=False)
+        except Exception as e:
             return {
                 "status": "error",
-                "message": "No content found for this subject/unit"
+                "message": f"Error generating {kind}: {str(e)}"
             }
-        
-        # Limit content size (first 15000 characters to avoid token limits)
-        if len(content) > 15000:
-            content = content[:15000] + "..."
+    
+    def _get_summary_content(self, subject: str, unit: str) -> Dict:
+
+        # Whole unit: long units are summarized batch by batch and the final
+        # prompt receives the partial summaries
+        chunks = get_embedding_service().get_unit_chunks(subject, unit)
+        return self._pack_summary_content(self._summarizer.collapse(subject, unit, chunks))
+    
+    async def _aget_summary_content(self, subject: str, unit: str) -> Dict:
+
+        # Store reads are blocking, keep them off the event loop
+        chunks = await asyncio.to_thread(get_embedding_service().get_unit_chunks, subject, unit)
+        return self._pack_summary_content(await self._summarizer.acollapse(subject, unit, chunks))
+    
+    def _pack_summary_content(self, collapsed: Dict) -> Dict:
+
+        packed = pack_chunks(collapsed["pieces"], CONTEXT_TOKENS_SUMMARY)
+        packed["truncated"] = collapsed["truncated"]
+        return packed
+    
+    def _pack_relevant_docs(self, relevant_docs: List[Dict]) -> Dict:
+
+        # Best ranked chunks first; the sources are those that made it into the prompt
+        packed = pack_chunks([doc["content"] for doc in relevant_docs], CONTEXT_TOKENS_ASK)
+        packed["docs"] = [relevant_docs[i] for i in packed["indices"]]
+        return packed
+    
+    def _summary_prompt(self) -> "PromptTemplate":
+
+        from langchain_core.prompts import PromptTemplate
         
         # Summary prompt
-        prompt = PromptTemplate(
+        return PromptTemplate(
             input_variables=["content"],
             template="""You are an expert educator. Summarize the following educational content into a structured, note-wise format with clear bullet points.
 
@@ -63,69 +150,127 @@ Create a comprehensive summary with:
 
 Format the summary with clear headings and bullet points for easy study."""
         )
-        
-        # Create chain using LCEL
-        chain = prompt | self.llm | StrOutputParser()
+    
+    def _summary_chain(self):
+
+        return self._summary_prompt() | self.llm | self._output_parser
+    
+    def _cached_summary(self, subject: str, unit: str, chapter: Optional[str]) -> Optional[Dict]:
+
+        # Same unit and corpus version produce the same summary
+        return get_result_cache().get(subject, unit, "summary", {"chapter": chapter})
+    
+    def _summary_response(self, subject: str, unit: str, chapter: Optional[str], packed: Dict, summary: str) -> Dict:
+
+        # Reports whether partial summaries had to be cut to fit the final prompt
+        context = self._context_report(packed)
+        context["truncated"] = packed["truncated"]
+        response = {
+            "status": "success",
+            "subject": subject,
+            "unit": unit,
+            "summary": summary,
+            "context": context
+        }
+        get_result_cache().set(subject, unit, "summary", {"chapter": chapter}, response)
+        return response
+    
+    def _no_content_error(self) -> Dict:
+
+        return {
+            "status": "error",
+            "message": "No content found for this subject/unit"
+        }
+    
+    def generate_summary(self, subject: str, unit: str, chapter: Optional[str] = None) -> Dict:
+
+        cached = self._cached_summary(subject, unit, chapter)
+        if cached:
+            return cached
         
         try:
-            result = chain.invoke({"content": content})
+            packed = self._get_summary_content(subject, unit)
+            if not packed["text"]:
+                return self._no_content_error()
             
-            return {
-                "status": "success",
-                "subject": subject,
-                "unit": unit,
-                "summary": result
-            }
+            result = self._invoke(self._summary_chain(), {"content": packed["text"]})
+            return self._summary_response(subject, unit, chapter, packed, result)
         except Exception as e:
             return {
                 "status": "error",
                 "message": f"Error generating summary: {str(e)}"
             }
     
-    def generate_mcqs(self, subject: str, unit: str, count: int = 10, previous_questions: list = None) -> Dict:
+    async def agenerate_summary(self, subject: str, unit: str, chapter: Optional[str] = None) -> Dict:
 
-        embedding_service = get_embedding_service()
+        cached = self._cached_summary(subject, unit, chapter)
+        if cached:
+            return cached
         
-        # Get all documents content
-        content = embedding_service.get_all_documents_content(subject, unit)
-        
-        if not content:
+        try:
+            packed = await self._aget_summary_content(subject, unit)
+            if not packed["text"]:
+                return self._no_content_error()
+            
+            result = await self._ainvoke(self._summary_chain(), {"content": packed["text"]})
+            return self._summary_response(subject, unit, chapter, packed, result)
+        except Exception as e:
             return {
                 "status": "error",
-                "message": "No content found for this subject/unit"
+                "message": f"Error generating summary: {str(e)}"
             }
+    
+    async def astream_summary(self, subject: str, unit: str, chapter: Optional[str] = None) -> AsyncIterator[Dict]:
+
+        cached = self._cached_summary(subject, unit, chapter)
+        if cached:
+            yield {"type": "token", "content": cached["summary"]}
+            yield {"type": "done"}
+            return
         
-        # Limit content size
-        if len(content) > 12000:
-            content = content[:12000] + "..."
+        try:
+            packed = await self._aget_summary_content(subject, unit)
+        except Exception as e:
+            yield {"type": "error", "message": f"Error generating summary: {str(e)}"}
+            return
         
-        # Build previous questions context
-        previous_context = ""
-        if previous_questions and len(previous_questions) > 0:
-            previous_context = "\n\nPREVIOUSLY ASKED QUESTIONS (DO NOT REPEAT OR CREATE SIMILAR QUESTIONS):\n"
-            for i, pq in enumerate(previous_questions, 1):
-                previous_context += f"{i}. {pq}\n"
-            previous_context += "\nIMPORTANT: Create questions on DIFFERENT topics/concepts than the above questions.\n"
+        if not packed["text"]:
+            yield {"type": "error", "message": self._no_content_error()["message"]}
+            return
+        
+        try:
+            tokens = []
+            async for token in self._astream(self._summary_chain(), {"content": packed["text"]}):
+                tokens.append(token)
+                yield {"type": "token", "content": token}
+            
+            self._summary_response(subject, unit, chapter, packed, "".join(tokens))
+            yield {"type": "done"}
+        except Exception as e:
+            yield {"type": "error", "message": f"Error generating summary: {str(e)}"}
+    
+    def _mcq_prompt(self) -> "PromptTemplate":
+
+        from langchain_core.prompts import PromptTemplate
         
         # MCQ prompt
-        prompt = PromptTemplate(
-            input_variables=["content", "count", "previous_context"],
+        return PromptTemplate(
+            input_variables=["content", "count"],
             template="""You are an expert educator creating diverse multiple choice questions. Based on the following educational content, create {count} multiple choice questions that cover DIFFERENT topics and concepts from across the entire content.
 
 Content:
 {content}
-{previous_context}
+
 IMPORTANT INSTRUCTIONS:
 1. Cover DIVERSE topics - each question should test a different concept or area from the content
-2. If previous questions are provided above, ensure your new questions cover COMPLETELY DIFFERENT topics
-3. Vary difficulty levels - include easy, medium, and challenging questions
-4. Use different question types:
+2. Vary difficulty levels - include easy, medium, and challenging questions
+3. Use different question types:
    - Factual recall ("What is...?", "Which of the following...?")
    - Conceptual understanding ("Why does...?", "How does...?")
    - Application-based ("In which scenario...?", "What would happen if...?")
    - Analysis ("Compare...", "What is the relationship between...?")
-5. Ensure NO repetitive or similar questions
-6. Make all distractors (wrong options) plausible but clearly incorrect
+4. Ensure NO repetitive or similar questions
+5. Make all distractors (wrong options) plausible but clearly incorrect
 
 For each question, provide:
 1. The question text
@@ -146,28 +291,6 @@ Explanation: [brief explanation]
 
 Create {count} DIVERSE questions covering DIFFERENT concepts and topics from the entire content."""
         )
-        
-        # Create chain using LCEL
-        chain = prompt | self.llm | StrOutputParser()
-        
-        try:
-            result = chain.invoke({"content": content, "count": count, "previous_context": previous_context})
-            
-            # Parse MCQs
-            mcqs = self._parse_mcqs(result)
-            
-            return {
-                "status": "success",
-                "subject": subject,
-                "unit": unit,
-                "count": len(mcqs),
-                "mcqs": mcqs
-            }
-        except Exception as e:
-            return {
-                "status": "error",
-                "message": f"Error generating MCQs: {str(e)}"
-            }
     
     def _parse_mcqs(self, mcq_text: str) -> List[Dict]:
 
@@ -212,52 +335,30 @@ Create {count} DIVERSE questions covering DIFFERENT concepts and topics from the
         
         return mcqs
     
-    def generate_flashcards(self, subject: str, unit: str, count: int = 10, previous_cards: list = None) -> Dict:
+    def _flashcard_prompt(self) -> "PromptTemplate":
 
-        embedding_service = get_embedding_service()
-        
-        # Get all documents content
-        content = embedding_service.get_all_documents_content(subject, unit)
-        
-        if not content:
-            return {
-                "status": "error",
-                "message": "No content found for this subject/unit"
-            }
-        
-        # Limit content size
-        if len(content) > 12000:
-            content = content[:12000] + "..."
-        
-        # Build previous cards context
-        previous_context = ""
-        if previous_cards and len(previous_cards) > 0:
-            previous_context = "\n\nPREVIOUSLY CREATED FLASHCARDS (DO NOT REPEAT OR CREATE SIMILAR TOPICS):\n"
-            for i, pc in enumerate(previous_cards, 1):
-                previous_context += f"{i}. {pc}\n"
-            previous_context += "\nIMPORTANT: Create flashcards on DIFFERENT topics/concepts than the above flashcards.\n"
+        from langchain_core.prompts import PromptTemplate
         
         # Flashcard prompt
-        prompt = PromptTemplate(
-            input_variables=["content", "count", "previous_context"],
+        return PromptTemplate(
+            input_variables=["content", "count"],
             template="""You are an expert educator creating comprehensive study flashcards. Based on the following educational content, create {count} flashcards that systematically cover the ENTIRE unit.
 
 Content:
 {content}
-{previous_context}
+
 IMPORTANT INSTRUCTIONS:
 1. Cover ALL major topics and subtopics from the content
-2. If previous flashcards are provided above, ensure your new flashcards cover COMPLETELY DIFFERENT topics
-3. Distribute flashcards across different sections of the material
-4. Include a mix of:
+2. Distribute flashcards across different sections of the material
+3. Include a mix of:
    - Key definitions and terminology
    - Important concepts and principles
    - Formulas, equations, or procedures (if applicable)
    - Real-world applications and examples
    - Relationships between concepts
-5. Progress from fundamental to advanced concepts
-6. Ensure NO duplicate or overlapping content
-7. Keep answers concise but informative (2-3 sentences)
+4. Progress from fundamental to advanced concepts
+5. Ensure NO duplicate or overlapping content
+6. Keep answers concise but informative (2-3 sentences)
 
 For each flashcard, provide:
 - Front: A clear question or term
@@ -272,28 +373,6 @@ Back: [concise answer - 2-3 sentences maximum]
 
 Create {count} flashcards that comprehensively cover the ENTIRE unit from beginning to end."""
         )
-        
-        # Create chain using LCEL
-        chain = prompt | self.llm | StrOutputParser()
-        
-        try:
-            result = chain.invoke({"content": content, "count": count, "previous_context": previous_context})
-            
-            # Parse flashcards
-            flashcards = self._parse_flashcards(result)
-            
-            return {
-                "status": "success",
-                "subject": subject,
-                "unit": unit,
-                "count": len(flashcards),
-                "flashcards": flashcards
-            }
-        except Exception as e:
-            return {
-                "status": "error",
-                "message": f"Error generating flashcards: {str(e)}"
-            }
     
     def _parse_flashcards(self, flashcard_text: str) -> List[Dict]:
 
@@ -325,24 +404,169 @@ Create {count} flashcards that comprehensively cover the ENTIRE unit from beginn
         
         return flashcards
     
-    def ask_question(self, subject: str, unit: str, question: str) -> Dict:
+    def _parse_quiz(self, kind: str, text: str) -> List[Dict]:
 
-        embedding_service = get_embedding_service()
+        return self._parse_mcqs(text) if kind == "mcq" else self._parse_flashcards(text)
+    
+    def _quiz_chain(self, kind: str):
+
+        prompt = self._mcq_prompt() if kind == "mcq" else self._flashcard_prompt()
+        return prompt | self.llm | self._output_parser
+    
+    def _quiz_round_shortcut(self, subject: str, unit: str, kind: str, count: int, packed: Dict, use_cache: bool) -> Optional[Dict]:
+
+        # The error or cached response that makes the LLM call unnecessary, if any
+        if not packed["text"]:
+            return self._no_content_error()
+        
+        # Keyed by the selected chunks too, so the rotation is not undone by the cache
+        if use_cache:
+            return get_result_cache().get(subject, unit, kind, {"count": count, "chunks": packed["chunk_ids"]})
+        return None
+    
+    def _quiz_round_response(self, subject: str, unit: str, kind: str, count: int, packed: Dict, result: str, use_cache: bool) -> Dict:
+
+        response = {
+            "status": "success",
+            "items": self._parse_quiz(kind, result),
+            "chunk_ids": packed["chunk_ids"],
+            "context": self._context_report(packed)
+        }
+        if use_cache:
+            get_result_cache().set(subject, unit, kind, {"count": count, "chunks": packed["chunk_ids"]}, response)
+        return response
+    
+    def _quiz_round(self, subject: str, unit: str, kind: str, count: int, use_cache: bool = True) -> Dict:
+
+        packed = self._get_unit_content(subject, unit, CONTEXT_TOKENS_QUIZ)
+        shortcut = self._quiz_round_shortcut(subject, unit, kind, count, packed, use_cache)
+        if shortcut:
+            return shortcut
         
-        # Query relevant documents
-        relevant_docs = embedding_service.query_documents(subject, unit, question, n_results=5)
+        result = self._invoke(self._quiz_chain(kind), {"content": packed["text"], "count": count})
+        return self._quiz_round_response(subject, unit, kind, count, packed, result, use_cache)
+    
+    async def _aquiz_round(self, subject: str, unit: str, kind: str, count: int, use_cache: bool = True) -> Dict:
+
+        packed = await asyncio.to_thread(self._get_unit_content, subject, unit, CONTEXT_TOKENS_QUIZ)
+        shortcut = self._quiz_round_shortcut(subject, unit, kind, count, packed, use_cache)
+        if shortcut:
+            return shortcut
         
-        if not relevant_docs:
-            return {
-                "status": "error",
-                "message": "No relevant content found for this question"
-            }
+        result = await self._ainvoke(self._quiz_chain(kind), {"content": packed["text"], "count": count})
+        return self._quiz_round_response(subject, unit, kind, count, packed, result, use_cache)
+    
+    def _start_quiz(self, session_id: Optional[str]) -> Dict:
+
+        # Without a session the history only spans the rounds of this request
+        return {
+            "session": session_id or f"request-{uuid.uuid4().hex}",
+            "items": [],
+            "context": None,
+            "rejected": 0
+        }
+    
+    def _record_quiz_round(self, state: Dict, round_result: Dict, generated: List[Dict], accepted: List[Dict], count: int) -> bool:
+
+        # Returns whether the quiz is complete
+        state["items"].extend(accepted)
+        state["rejected"] += len(generated) - len(accepted)
+        state["context"] = state["context"] or round_result["context"]
+        return len(state["items"]) >= count
+    
+    def _finish_quiz(self, state: Dict, session_id: Optional[str]):
+
+        if not session_id:
+            get_session_dedup().forget(state["session"])
+    
+    def _quiz_error(self, kind: str, error: Exception) -> Dict:
+
+        return {
+            "status": "error",
+            "message": f"Error generating {'MCQs' if kind == 'mcq' else 'flashcards'}: {str(error)}"
+        }
+    
+    def _quiz_result(self, subject: str, unit: str, kind: str, state: Dict) -> Dict:
+
+        return {
+            "status": "success",
+            "subject": subject,
+            "unit": unit,
+            "count": len(state["items"]),
+            QUIZ_RESULT_KEYS[kind]: state["items"],
+            "context": state["context"],
+            "rejected_duplicates": state["rejected"]
+        }
+    
+    def _generate_quiz(self, subject: str, unit: str, kind: str, count: int, session_id: Optional[str], previous: Optional[List[str]]) -> Dict:
+
+        state = self._start_quiz(session_id)
+        try:
+            # Near-duplicates of what the session has seen are dropped and only
+            # those are asked for again, so the prompt never grows with the quiz.
+            # A small unit gets the same chunks every time, so a repeat round must
+            # bypass the cache or it would return the very items just rejected
+            for round_number in range(QUIZ_DEDUP_MAX_ROUNDS):
+                needed = count - len(state["items"])
+                round_result = self._quiz_round(subject, unit, kind, needed, use_cache=round_number == 0)
+                if round_result["status"] != "success":
+                    return round_result
+                
+                generated = round_result["items"][:needed]
+                accepted = get_session_dedup().filter(state["session"], kind, generated, previous)
+                if self._record_quiz_round(state, round_result, generated, accepted, count):
+                    break
+        except Exception as e:
+            return self._quiz_error(kind, e)
+        finally:
+            self._finish_quiz(state, session_id)
+        
+        return self._quiz_result(subject, unit, kind, state)
+    
+    async def _agenerate_quiz(self, subject: str, unit: str, kind: str, count: int, session_id: Optional[str], previous: Optional[List[str]]) -> Dict:
+
+        state = self._start_quiz(session_id)
+        try:
+            for round_number in range(QUIZ_DEDUP_MAX_ROUNDS):
+                needed = count - len(state["items"])
+                round_result = await self._aquiz_round(subject, unit, kind, needed, use_cache=round_number == 0)
+                if round_result["status"] != "success":
+                    return round_result
+                
+                # Embedding the items is blocking, keep it off the event loop
+                generated = round_result["items"][:needed]
+                accepted = await asyncio.to_thread(get_session_dedup().filter, state["session"], kind, generated, previous)
+                if self._record_quiz_round(state, round_result, generated, accepted, count):
+                    break
+        except Exception as e:
+            return self._quiz_error(kind, e)
+        finally:
+            self._finish_quiz(state, session_id)
         
-        # Combine context
-        context = "\n\n".join([doc["content"] for doc in relevant_docs])
+        return self._quiz_result(subject, unit, kind, state)
+    
+    def generate_mcqs(self, subject: str, unit: str, count: int = 10, session_id: Optional[str] = None, previous_questions: list = None) -> Dict:
+
+        return self._generate_quiz(subject, unit, "mcq", count, session_id, previous_questions)
+    
+    async def agenerate_mcqs(self, subject: str, unit: str, count: int = 10, session_id: Optional[str] = None, previous_questions: list = None) -> Dict:
+
+        return await self._agenerate_quiz(subject, unit, "mcq", count, session_id, previous_questions)
+    
+    def generate_flashcards(self, subject: str, unit: str, count: int = 10, session_id: Optional[str] = None, previous_cards: list = None) -> Dict:
+
+        return self._generate_quiz(subject, unit, "flashcards", count, session_id, previous_cards)
+    
+    async def agenerate_flashcards(self, subject: str, unit: str, count: int = 10, session_id: Optional[str] = None, previous_cards: list = None) -> Dict:
+
+        return await self._agenerate_quiz(subject, unit, "flashcards", count, session_id, previous_cards)
+    
+    def _ask_prompt(self) -> "PromptTemplate":
+
+        from langchain_core.prompts import PromptTemplate
         
         # QA prompt
-        prompt = PromptTemplate(
+        return PromptTemplate(
             input_variables=["context", "question"],
             template="""You are a helpful teaching assistant. Answer the student's question based on the provided context.
 
@@ -359,24 +583,105 @@ Instructions:
 
 Answer:"""
         )
+    
+    def ask_question(self, subject: str, unit: str, question: str, retrieval: Optional[str] = None) -> Dict:
+
+        embedding_service = get_embedding_service()
+        
+        # Query relevant documents; retrieval picks dense, keyword, hybrid or auto
+        relevant_docs = embedding_service.query_documents(subject, unit, question, n_results=5, mode=retrieval)
+        
+        if not relevant_docs:
+            return {
+                "status": "error",
+                "message": "No relevant content found for this question"
+            }
+        
+        # Combine context, whole chunks up to the token budget
+        packed = self._pack_relevant_docs(relevant_docs)
         
         # Create chain using LCEL
-        chain = prompt | self.llm | StrOutputParser()
+        chain = self._ask_prompt() | self.llm | self._output_parser
         
         try:
-            answer = chain.invoke({"context": context, "question": question})
+            answer = self._invoke(chain, {"context": packed["text"], "question": question})
             
             return {
                 "status": "success",
                 "question": question,
                 "answer": answer,
-                "sources": [doc["metadata"].get("source", "Unknown") for doc in relevant_docs]
+                "sources": [doc["metadata"].get("source", "Unknown") for doc in packed["docs"]],
+                "context": self._context_report(packed)
             }
         except Exception as e:
             return {
                 "status": "error",
                 "message": f"Error answering question: {str(e)}"
             }
+    
+    async def aask_question(self, subject: str, unit: str, question: str, retrieval: Optional[str] = None) -> Dict:
+
+        embedding_service = get_embedding_service()
+        
+        # Query embedding and index searches are blocking, keep them off the event loop
+        relevant_docs = await asyncio.to_thread(
+            embedding_service.query_documents, subject, unit, question, 5, retrieval
+        )
+        
+        if not relevant_docs:
+            return {
+                "status": "error",
+                "message": "No relevant content found for this question"
+            }
+        
+        packed = self._pack_relevant_docs(relevant_docs)
+        chain = self._ask_prompt() | self.llm | self._output_parser
+        
+        try:
+            answer = await self._ainvoke(chain, {"context": packed["text"], "question": question})
+            
+            return {
+                "status": "success",
+                "question": question,
+                "answer": answer,
+                "sources": [doc["metadata"].get("source", "Unknown") for doc in packed["docs"]],
+                "context": self._context_report(packed)
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Error answering question: {str(e)}"
+            }
+    
+    async def astream_answer(self, subject: str, unit: str, question: str, retrieval: Optional[str] = None) -> AsyncIterator[Dict]:
+
+        embedding_service = get_embedding_service()
+        
+        relevant_docs = await asyncio.to_thread(
+            embedding_service.query_documents, subject, unit, question, 5, retrieval
+        )
+        
+        if not relevant_docs:
+            yield {"type": "error", "message": "No relevant content found for this question"}
+            return
+        
+        packed = self._pack_relevant_docs(relevant_docs)
+        
+        # Sources are known before generation starts, send them first
+        yield {
+            "type": "sources",
+            "sources": [doc["metadata"].get("source", "Unknown") for doc in packed["docs"]],
+            "context": self._context_report(packed)
+        }
+        
+        chain = self._ask_prompt() | self.llm | self._output_parser
+        
+        try:
+            async for token in self._astream(chain, {"context": packed["text"], "question": question}):
+                yield {"type": "token", "content": token}
+            yield {"type": "done"}
+        except Exception as e:
+            yield {"type": "error", "message": f"Error answering question: {str(e)}"}
 
 # Global instance
 _rag_service_instance = None
@@ -0,0 +1,132 @@
+
+import os
+import threading
+import numpy as np
+from typing import List, Dict, Optional
+from utils.hf_embeddings import get_embeddings
+from utils.lru_cache import LRUCache
+from services.question_bank import item_key
+
+# Generated items at least this similar (cosine) to one the session has seen are rejected
+DEDUP_SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", "0.9"))
+# Quiz sessions remembered per process, and for how long after their last request
+DEDUP_MAX_SESSIONS = int(os.getenv("DEDUP_MAX_SESSIONS", "2048"))
+DEDUP_SESSION_TTL_SECONDS = float(os.getenv("DEDUP_SESSION_TTL_SECONDS", "21600"))
+# Items remembered per session and kind, oldest forgotten first
+DEDUP_MAX_HISTORY = int(os.getenv("DEDUP_MAX_HISTORY", "500"))
+
+class SessionHistory:
+
+    
+    def __init__(self):
+        self.texts = []
+        self.vectors = None
+    
+    def add(self, texts: List[str], vectors: np.ndarray):
+
+        self.texts.extend(texts)
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+        if len(self.texts) > DEDUP_MAX_HISTORY:
+            self.texts = self.texts[-DEDUP_MAX_HISTORY:]
+            self.vectors = self.vectors[-DEDUP_MAX_HISTORY:]
+    
+    def max_similarity(self, vector: np.ndarray) -> float:
+
+        if self.vectors is None or len(self.vectors) == 0:
+            return -1.0
+        return float(np.max(self.vectors @ vector))
+
+class SessionDeduplicator:
+
+    
+    def __init__(self):
+        # (session id, kind) -> SessionHistory
+        self._sessions = LRUCache(DEDUP_MAX_SESSIONS, DEDUP_SESSION_TTL_SECONDS)
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = 0
+    
+    def _embed(self, texts: List[str]) -> np.ndarray:
+
+        # Straight to the model: generated questions are one-off texts and would only
+        # grow the persistent chunk embedding cache
+        vectors = np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    
+    def _history(self, session_id: Optional[str], kind: str) -> SessionHistory:
+
+        # Without a session id the history lives for this request only
+        if not session_id:
+            return SessionHistory()
+        
+        history = self._sessions.get((session_id, kind))
+        if history is None:
+            history = SessionHistory()
+        # Set on every use so the TTL counts from the latest request
+        self._sessions.set((session_id, kind), history)
+        return history
+    
+    def seen_texts(self, session_id: Optional[str], kind: str) -> List[str]:
+
+        if not session_id:
+            return []
+        history = self._sessions.get((session_id, kind))
+        return list(history.texts) if history else []
+    
+    def filter(self, session_id: Optional[str], kind: str, items: List[Dict], previous: Optional[List[str]] = None) -> List[Dict]:
+
+        if not items:
+            return []
+        
+        texts = [item_key(kind, item) for item in items]
+        vectors = self._embed(texts)
+        
+        # Older clients send what they have seen instead of a session id
+        previous = list(dict.fromkeys(" ".join(text.lower().split()) for text in previous or []))
+        previous_vectors = self._embed(previous) if previous else None
+        
+        with self._lock:
+            history = self._history(session_id, kind)
+            
+            if previous:
+                known = set(history.texts)
+                new = [i for i, text in enumerate(previous) if text not in known]
+                if new:
+                    history.add([previous[i] for i in new], previous_vectors[new])
+            
+            # Compared against the history and against items accepted earlier in this batch
+            accepted = []
+            for item, text, vector in zip(items, texts, vectors):
+                if history.max_similarity(vector) >= DEDUP_SIMILARITY_THRESHOLD:
+                    continue
+                history.add([text], vector[None, :])
+                accepted.append(item)
+            
+            self.checked += len(items)
+            self.rejected += len(items) - len(accepted)
+        
+        return accepted
+    
+    def forget(self, session_id: str):
+
+        self._sessions.remove_if(lambda key: key[0] == session_id)
+    
+    def stats(self) -> Dict:
+
+        stats = self._sessions.stats()
+        stats.update({
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "threshold": DEDUP_SIMILARITY_THRESHOLD
+        })
+        return stats
+
+# Global instance
+_session_dedup_instance = None
+
+def get_session_dedup() -> SessionDeduplicator:
+
+    global _session_dedup_instance
+    if _session_dedup_instance is None:
+        _session_dedup_instance = SessionDeduplicator()
+    return _session_dedup_instance
@@ -0,0 +1,250 @@
+
+import os
+import json
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Callable, Awaitable, TYPE_CHECKING
+from services.file_service import get_file_service
+from utils.context_packer import count_tokens, CONTEXT_TOKENS_SUMMARY
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import PromptTemplate
+
+# Input size of one map call, and of the combined partials the final prompt receives
+SUMMARY_BATCH_TOKENS = int(os.getenv("SUMMARY_BATCH_TOKENS", "3000"))
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", str(CONTEXT_TOKENS_SUMMARY)))
+# Map calls one summary keeps in flight, within the service-wide LLM limit
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "8"))
+# Reduce rounds after the first map before the partials are cut to fit the final prompt
+SUMMARY_MAX_REDUCE_ROUNDS = int(os.getenv("SUMMARY_MAX_REDUCE_ROUNDS", "4"))
+
+# Bump when the map prompt changes so cached partials are regenerated
+MAP_PROMPT_VERSION = "1"
+
+def pack_batches(texts: List[str], budget: int) -> List[str]:
+
+    # Consecutive texts up to the budget; a text larger than the budget is a batch alone
+    separator_tokens = count_tokens("\n\n")
+    batches = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text) + (separator_tokens if current else 0)
+        if current and current_tokens + tokens > budget:
+            batches.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+            tokens -= separator_tokens
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+class MapReduceSummarizer:
+
+    
+    def __init__(self, llm, output_parser, invoke: Callable[..., str], ainvoke: Callable[..., Awaitable[str]]):
+        self.llm = llm
+        self.output_parser = output_parser
+        # The service's limiter-guarded invokes, so map calls count towards LLM_MAX_CONCURRENCY
+        self.invoke = invoke
+        self.ainvoke = ainvoke
+    
+    def _map_prompt(self) -> "PromptTemplate":
+
+        from langchain_core.prompts import PromptTemplate
+        
+        return PromptTemplate(
+            input_variables=["content"],
+            template="""You are an expert educator. The following is one section of a longer unit of study material. Summarize it as concise study notes.
+
+Content:
+{content}
+
+Keep every main concept, key definition and term, formula or principle, and notable example from this section. Use short bullet points and do not add information that is not in the content."""
+        )
+    
+    def plan_batches(self, chunks: List[Dict], budget: int = SUMMARY_BATCH_TOKENS) -> List[str]:
+
+        # Batches never span two documents, so editing one file leaves the
+        # batches (and cached partials) of the others untouched
+        batches = []
+        texts = []
+        source = None
+        for chunk in chunks:
+            chunk_source = chunk["metadata"].get("source")
+            if texts and chunk_source != source:
+                batches.extend(pack_batches(texts, budget))
+                texts = []
+            source = chunk_source
+            texts.append(chunk["content"])
+        if texts:
+            batches.extend(pack_batches(texts, budget))
+        return batches
+    
+    def fits_final_prompt(self, chunks: List[Dict]) -> bool:
+
+        return self._fits(chunk["content"] for chunk in chunks)
+    
+    def _fits(self, texts) -> bool:
+
+        separator_tokens = count_tokens("\n\n")
+        total = sum(count_tokens(text) + separator_tokens for text in texts) - separator_tokens
+        return total <= SUMMARY_REDUCE_TOKENS
+    
+    def _next_batches(self, batches: List[str], partials: List[str], reduce_round: int):
+
+        # None once the partials fit the final prompt or the rounds run out
+        if self._fits(partials) or reduce_round >= SUMMARY_MAX_REDUCE_ROUNDS:
+            return None
+        
+        # Partials too long to combine into fewer groups are condensed one by one
+        groups = pack_batches(partials, SUMMARY_REDUCE_TOKENS)
+        return groups if len(groups) < len(batches) else partials
+    
+    def _collapsed(self, pieces: List[str]) -> Dict:
+
+        # Whatever still exceeds the final prompt is cut there; say so rather
+        # than leave it to a silent drop
+        truncated = not self._fits(pieces)
+        if truncated:
+            print(f"Warning: partial summaries still exceed {SUMMARY_REDUCE_TOKENS} tokens after {SUMMARY_MAX_REDUCE_ROUNDS} reduce rounds; the final prompt is truncated")
+        return {"pieces": pieces, "truncated": truncated}
+    
+    def _partials_path(self, subject: str, unit: str) -> str:
+
+        return os.path.join(get_file_service().get_summaries_path(subject, unit), "partials")
+    
+    def _partial_key(self, text: str) -> str:
+
+        payload = f"{MAP_PROMPT_VERSION}\n{getattr(self.llm, 'model_name', '')}\n{text}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _load_partial(self, subject: str, unit: str, key: str):
+
+        try:
+            with open(os.path.join(self._partials_path(subject, unit), f"{key}.json"), 'r') as f:
+                return json.load(f)["summary"]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _save_partial(self, subject: str, unit: str, key: str, summary: str):
+
+        partials_path = self._partials_path(subject, unit)
+        os.makedirs(partials_path, exist_ok=True)
+        
+        # Write atomically so a concurrent summary never reads a partial file
+        partial_file = os.path.join(partials_path, f"{key}.json")
+        tmp_file = f"{partial_file}.tmp{os.getpid()}"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump({"summary": summary}, f)
+            os.replace(tmp_file, partial_file)
+        except OSError as e:
+            print(f"Error writing partial summary {partial_file}: {str(e)}")
+    
+    def prune_partials(self, subject: str, unit: str, keep_keys):
+
+        # Partials of batches that no longer exist after a re-ingest
+        partials_path = self._partials_path(subject, unit)
+        if not os.path.exists(partials_path):
+            return
+        
+        keep = {f"{key}.json" for key in keep_keys}
+        for filename in os.listdir(partials_path):
+            if filename.endswith(".json") and filename not in keep:
+                try:
+                    os.remove(os.path.join(partials_path, filename))
+                except OSError:
+                    pass
+    
+    def _map(self, subject: str, unit: str, batches: List[str], used_keys: set) -> List[str]:
+
+        keys = [self._partial_key(text) for text in batches]
+        used_keys.update(keys)
+        summaries = [self._load_partial(subject, unit, key) for key in keys]
+        
+        # Only batches without a cached partial go to the LLM, in parallel threads
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        if missing:
+            chain = self._map_prompt() | self.llm | self.output_parser
+            
+            def summarize_batch(i: int) -> str:
+                summary = self.invoke(chain, {"content": batches[i]})
+                self._save_partial(subject, unit, keys[i], summary)
+                return summary
+            
+            # Batches that finished are cached even if another one fails
+            with ThreadPoolExecutor(max_workers=min(SUMMARY_MAP_CONCURRENCY, len(missing))) as executor:
+                for i, summary in zip(missing, executor.map(summarize_batch, missing)):
+                    summaries[i] = summary
+        return summaries
+    
+    async def _amap(self, subject: str, unit: str, batches: List[str], used_keys: set) -> List[str]:
+
+        chain = self._map_prompt() | self.llm | self.output_parser
+        semaphore = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+        
+        async def summarize_batch(text: str) -> str:
+            key = self._partial_key(text)
+            used_keys.add(key)
+            
+            summary = await asyncio.to_thread(self._load_partial, subject, unit, key)
+            if summary is not None:
+                return summary
+            
+            async with semaphore:
+                summary = await self.ainvoke(chain, {"content": text})
+            await asyncio.to_thread(self._save_partial, subject, unit, key, summary)
+            return summary
+        
+        # Batches that finished are cached even if another one fails
+        return await asyncio.gather(*(summarize_batch(text) for text in batches))
+    
+    def collapse(self, subject: str, unit: str, chunks: List[Dict]) -> Dict:
+
+        # Small units fit the final prompt as they are: one call, no map step
+        if self.fits_final_prompt(chunks):
+            return {"pieces": [chunk["content"] for chunk in chunks], "truncated": False}
+        
+        batches = self.plan_batches(chunks)
+        
+        used_keys = set()
+        
+        # Map the batches, then keep reducing the partials in budgeted groups
+        # until they fit the final prompt in one piece
+        reduce_round = 0
+        while True:
+            partials = self._map(subject, unit, batches, used_keys)
+            batches = self._next_batches(batches, partials, reduce_round)
+            if batches is None:
+                break
+            reduce_round += 1
+        
+        self.prune_partials(subject, unit, used_keys)
+        return self._collapsed(partials)
+    
+    async def acollapse(self, subject: str, unit: str, chunks: List[Dict]) -> Dict:
+
+        # Small units fit the final prompt as they are: one call, no map step
+        if self.fits_final_prompt(chunks):
+            return {"pieces": [chunk["content"] for chunk in chunks], "truncated": False}
+        
+        batches = self.plan_batches(chunks)
+        
+        used_keys = set()
+        
+        # Map the batches, then keep reducing the partials in budgeted groups
+        # until they fit the final prompt in one piece
+        reduce_round = 0
+        while True:
+            partials = await self._amap(subject, unit, batches, used_keys)
+            batches = self._next_batches(batches, partials, reduce_round)
+            if batches is None:
+                break
+            reduce_round += 1
+        
+        await asyncio.to_thread(self.prune_partials, subject, unit, used_keys)
+        return self._collapsed(partials)
@@ -0,0 +1,592 @@
+
+import os
+import json
+import threading
+import numpy as np
+from typing import List, Dict, Optional
+
+# "chroma" keeps one Chroma directory per unit, "numpy" a memory-mapped matrix per unit
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma").lower()
+NUMPY_INDEX_PATH = os.getenv("NUMPY_INDEX_PATH", "./vector_index")
+
+# Units with at least this many chunks get an IVF partitioning (0 disables IVF)
+NUMPY_IVF_MIN_VECTORS = int(os.getenv("NUMPY_IVF_MIN_VECTORS", "20000"))
+# Partitions searched per query when IVF is in use
+NUMPY_IVF_NPROBE = int(os.getenv("NUMPY_IVF_NPROBE", "8"))
+# Segments appended by flushes before they are folded into one; the whole
+# unit is compacted once at the end of each ingest
+NUMPY_MAX_SEGMENTS = int(os.getenv("NUMPY_MAX_SEGMENTS", "32"))
+
+def directory_size(path: str) -> int:
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0):
+
+    # Lloyd iterations on unit vectors, similarity by dot product; returns
+    # (unit-length centroids, assignment of every vector)
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].astype(np.float32)
+    
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        norms = np.linalg.norm(sums, axis=1)
+        # Empty clusters keep their previous centroid
+        filled = norms > 1e-12
+        centroids[filled] = sums[filled] / norms[filled, None]
+    
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+class VectorStore:
+
+    
+    # Recorded in the unit manifest, so a switch of VECTOR_STORE_BACKEND is detected
+    backend = None
+    
+    def count(self) -> int:
+
+        raise NotImplementedError
+    
+    def ids(self) -> List[str]:
+
+        return self.get_all()["ids"]
+    
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+
+        raise NotImplementedError
+    
+    def delete(self, ids: List[str]):
+
+        raise NotImplementedError
+    
+    def clear(self):
+
+        raise NotImplementedError
+    
+    def flush(self):
+
+        # Backends that buffer writes persist them here
+        pass
+    
+    def compact(self):
+
+        # Backends that append writes reorganize them here, once per ingest
+        pass
+    
+    def query(self, query_embedding, n_results: int) -> List[Dict]:
+
+        raise NotImplementedError
+    
+    def get_all(self, include_embeddings: bool = False) -> Dict[str, list]:
+
+        raise NotImplementedError
+    
+    def estimated_bytes(self) -> int:
+
+        return 0
+    
+    def close(self):
+
+        pass
+
+class ChromaVectorStore(VectorStore):
+
+    
+    backend = "chroma"
+    
+    def __init__(self, path: str, collection_name: str, metadata: Dict):
+        # chromadb is heavy to import, so it loads with the first collection
+        import chromadb
+        
+        self.path = path
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata=metadata
+        )
+    
+    def count(self) -> int:
+
+        return self.collection.count()
+    
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+
+        self.collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas
+        )
+    
+    def delete(self, ids: List[str]):
+
+        if ids:
+            self.collection.delete(ids=ids)
+    
+    def ids(self) -> List[str]:
+
+        return self.collection.get(include=[])["ids"]
+    
+    def clear(self):
+
+        self.delete(self.ids())
+    
+    def query(self, query_embedding, n_results: int) -> List[Dict]:
+
+        results = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results
+        )
+        
+        # Format results
+        formatted_results = []
+        if results and results['documents'] and len(results['documents']) > 0:
+            for i in range(len(results['documents'][0])):
+                formatted_results.append({
+                    "id": results['ids'][0][i],
+                    "content": results['documents'][0][i],
+                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
+                    "distance": results['distances'][0][i] if results.get('distances') else None
+                })
+        return formatted_results
+    
+    def get_all(self, include_embeddings: bool = False) -> Dict[str, list]:
+
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        results = self.collection.get(include=include)
+        all_records = {
+            "ids": results["ids"],
+            "documents": results["documents"] or [],
+            "metadatas": results["metadatas"] or []
+        }
+        if include_embeddings:
+            all_records["embeddings"] = np.asarray(results["embeddings"], dtype=np.float32)
+        return all_records
+    
+    def estimated_bytes(self) -> int:
+
+        # The SQLite file and HNSW segments are what Chroma pages into memory
+        return directory_size(self.path)
+    
+    def close(self):
+
+        # Client.close() only exists in newer chromadb; older versions free the
+        # system once the last reference is dropped
+        close = getattr(self.client, "close", None)
+        if close:
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing Chroma client: {str(e)}")
+
+class NumpyVectorStore(VectorStore):
+
+    
+    backend = "numpy"
+    
+    def __init__(self, path: str, ivf_min_vectors: int = NUMPY_IVF_MIN_VECTORS, nprobe: int = NUMPY_IVF_NPROBE, max_segments: int = NUMPY_MAX_SEGMENTS):
+        self.path = path
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        # Writes since the last flush: id -> (record, vector), and ids to drop
+        self._pending = {}
+        self._pending_deletes = set()
+        self._loaded_mtime = None
+        os.makedirs(path, exist_ok=True)
+        self._load()
+    
+    def _file(self, name: str, part: int) -> str:
+
+        return os.path.join(self.path, f"{name}.{part}")
+    
+    def _current_file(self) -> str:
+
+        return os.path.join(self.path, "current.json")
+    
+    def _load(self):
+
+        # The index is a list of immutable parts (the compacted base, then one
+        # segment per flush) plus the rows deleted since; current.json names them
+        # and is swapped atomically, so readers never see a half-written index
+        self.parts = []
+        self._starts = np.zeros(0, dtype=np.int64)
+        self.centroids = None
+        self.list_offsets = None
+        self.dead = np.zeros(0, dtype=bool)
+        self._id_rows = {}
+        self._current = {"generation": 0, "parts": [], "dead": [], "ivf": False, "next_part": 1}
+        self._loaded_mtime = None
+        
+        try:
+            self._loaded_mtime = os.path.getmtime(self._current_file())
+            with open(self._current_file(), 'r') as f:
+                current = json.load(f)
+        except (OSError, ValueError):
+            return
+        
+        # Indexes written before segments existed are a single part named by generation
+        current.setdefault("parts", [current["generation"]])
+        current.setdefault("dead", [])
+        current.setdefault("next_part", max(current["parts"], default=0) + 1)
+        
+        row_ids = []
+        for part in current["parts"]:
+            # Memory-mapped: opening a unit costs nothing until pages are touched
+            offsets = np.load(self._file("offsets", part) + ".npy")
+            self.parts.append({
+                "id": part,
+                "vectors": np.load(self._file("vectors", part) + ".npy", mmap_mode="r"),
+                "offsets": offsets,
+                "start": len(row_ids)
+            })
+            row_ids.extend(self._load_ids(part, offsets))
+        
+        # IVF partitions only ever cover the base part
+        if current.get("ivf") and self.parts:
+            self.centroids = np.load(self._file("centroids", current["parts"][0]) + ".npy")
+            self.list_offsets = np.load(self._file("lists", current["parts"][0]) + ".npy")
+        
+        self._starts = np.array([part["start"] for part in self.parts], dtype=np.int64)
+        self.dead = np.zeros(len(row_ids), dtype=bool)
+        self.dead[np.asarray(current["dead"], dtype=np.int64)] = True
+        self._id_rows = {record_id: row for row, record_id in enumerate(row_ids) if not self.dead[row]}
+        self._current = current
+    
+    def _load_ids(self, part: int, offsets: np.ndarray) -> List[str]:
+
+        try:
+            with open(self._file("ids", part) + ".json", 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Parts written before ids were stored separately
+            with open(self._file("records", part) + ".jsonl", 'rb') as f:
+                return [json.loads(line)["id"] for line in f]
+    
+    def _refresh(self):
+
+        # Another process (or worker) may have flushed a new generation
+        try:
+            mtime = os.path.getmtime(self._current_file())
+        except OSError:
+            mtime = None
+        if mtime != self._loaded_mtime:
+            self._load()
+    
+    def _locate(self, rows: np.ndarray) -> np.ndarray:
+
+        # Index of the part holding each row
+        return np.searchsorted(self._starts, rows, side="right") - 1
+    
+    def _read_records(self, rows) -> List[Dict]:
+
+        rows = np.asarray(rows, dtype=np.int64)
+        records = [None] * len(rows)
+        part_indices = self._locate(rows)
+        for index in np.unique(part_indices):
+            part = self.parts[index]
+            offsets = part["offsets"]
+            with open(self._file("records", part["id"]) + ".jsonl", 'rb') as f:
+                for position in np.flatnonzero(part_indices == index):
+                    row = rows[position] - part["start"]
+                    f.seek(int(offsets[row]))
+                    records[position] = json.loads(f.read(int(offsets[row + 1] - offsets[row])))
+        return records
+    
+    def _read_vectors(self, rows) -> np.ndarray:
+
+        rows = np.asarray(rows, dtype=np.int64)
+        dimension = next((part["vectors"].shape[1] for part in self.parts if len(part["vectors"])), 0)
+        vectors = np.zeros((len(rows), dimension), dtype=np.float32)
+        part_indices = self._locate(rows)
+        for index in np.unique(part_indices):
+            part = self.parts[index]
+            positions = np.flatnonzero(part_indices == index)
+            vectors[positions] = part["vectors"][rows[positions] - part["start"]]
+        return vectors
+    
+    def _live_ids(self) -> set:
+
+        return (set(self._id_rows) - self._pending_deletes) | set(self._pending)
+    
+    def count(self) -> int:
+
+        with self._lock:
+            self._refresh()
+            if not self._pending and not self._pending_deletes:
+                return len(self._id_rows)
+            return len(self._live_ids())
+    
+    def ids(self) -> List[str]:
+
+        with self._lock:
+            self._refresh()
+            return list(self._live_ids())
+    
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+
+        if not ids:
+            return
+        
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.clip(norms, 1e-12, None)
+        
+        # Only the new rows are held in memory; an older copy of the id is
+        # marked dead when they are flushed
+        with self._lock:
+            for i, record_id in enumerate(ids):
+                self._pending[record_id] = ({"id": record_id, "document": documents[i], "metadata": metadatas[i]}, vectors[i])
+    
+    def delete(self, ids: List[str]):
+
+        with self._lock:
+            for record_id in ids:
+                self._pending.pop(record_id, None)
+                self._pending_deletes.add(record_id)
+    
+    def clear(self):
+
+        with self._lock:
+            self._refresh()
+            self._pending = {}
+            self._pending_deletes.update(self._id_rows)
+    
+    def _build_ivf(self, vectors: np.ndarray):
+
+        # Spherical k-means with about sqrt(n) partitions
+        nlist = max(int(np.sqrt(len(vectors))), 1)
+        centroids, assignments = spherical_kmeans(vectors, nlist)
+        order = np.argsort(assignments, kind="stable")
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+        return centroids.astype(np.float32), order, list_offsets
+    
+    def _write_part(self, part: int, records: List[Dict], vectors: np.ndarray):
+
+        offsets = [0]
+        with open(self._file("records", part) + ".jsonl", 'wb') as f:
+            for record in records:
+                line = (json.dumps(record) + "\n").encode("utf-8")
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(self._file("offsets", part) + ".npy", np.array(offsets, dtype=np.int64))
+        np.save(self._file("vectors", part) + ".npy", np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(self._file("ids", part) + ".json", 'w') as f:
+            json.dump([record["id"] for record in records], f)
+    
+    def _commit(self, parts: List[int], dead, ivf: bool, next_part: int):
+
+        previous_parts = set(self._current["parts"])
+        total_rows = sum(len(self._read_offsets(part)) - 1 for part in parts)
+        
+        tmp_file = f"{self._current_file()}.tmp{os.getpid()}"
+        with open(tmp_file, 'w') as f:
+            json.dump({
+                "generation": self._current["generation"] + 1,
+                "parts": parts,
+                "dead": sorted(int(row) for row in dead),
+                "ivf": ivf,
+                "next_part": next_part,
+                "count": total_rows - len(dead)
+            }, f)
+        os.replace(tmp_file, self._current_file())
+        self._load()
+        
+        # Parts dropped by the previous write stay for readers that have not refreshed yet
+        keep = set(parts) | previous_parts
+        for filename in os.listdir(self.path):
+            name_parts = filename.split(".")
+            if len(name_parts) == 3 and name_parts[1].isdigit() and int(name_parts[1]) not in keep:
+                try:
+                    os.remove(os.path.join(self.path, filename))
+                except OSError:
+                    pass
+    
+    def _read_offsets(self, part: int) -> np.ndarray:
+
+        for loaded in self.parts:
+            if loaded["id"] == part:
+                return loaded["offsets"]
+        return np.load(self._file("offsets", part) + ".npy")
+    
+    def _flush(self):
+
+        if not self._pending and not self._pending_deletes:
+            return
+        self._refresh()
+        
+        # Replaced and deleted ids only mark their stored rows dead
+        dead = set(self._current["dead"])
+        for record_id in self._pending_deletes | set(self._pending):
+            row = self._id_rows.get(record_id)
+            if row is not None:
+                dead.add(row)
+        
+        # New rows go to a segment of their own; nothing already stored is rewritten
+        parts = list(self._current["parts"])
+        next_part = self._current["next_part"]
+        if self._pending:
+            entries = list(self._pending.values())
+            self._write_part(next_part, [record for record, _ in entries], np.stack([vector for _, vector in entries]))
+            parts.append(next_part)
+            next_part += 1
+        
+        self._pending = {}
+        self._pending_deletes = set()
+        self._commit(parts, dead, self._current.get("ivf", False), next_part)
+        
+        # Many small segments slow queries down; fold them into one
+        if len(self.parts) - 1 > self.max_segments:
+            self._merge(1)
+    
+    def flush(self):
+
+        with self._lock:
+            self._flush()
+    
+    def _merge(self, first: int):
+
+        # Live rows of parts[first:] are rewritten as a single part; from the first
+        # part on that is the whole unit, partitioned for IVF when large enough
+        if first >= len(self.parts):
+            return
+        
+        start = self.parts[first]["start"]
+        rows = start + np.flatnonzero(~self.dead[start:])
+        ivf = first == 0 and bool(self.ivf_min_vectors) and len(rows) >= self.ivf_min_vectors
+        part = self._current["next_part"]
+        
+        vectors = self._read_vectors(rows)
+        if ivf:
+            # Rows are stored grouped by partition so each list is a contiguous slice
+            centroids, order, list_offsets = self._build_ivf(vectors)
+            rows = rows[order]
+            vectors = vectors[order]
+            np.save(self._file("centroids", part) + ".npy", centroids)
+            np.save(self._file("lists", part) + ".npy", list_offsets)
+        
+        self._write_part(part, self._read_records(rows), vectors)
+        
+        dead = [row for row in self._current["dead"] if row < start]
+        keep_ivf = ivf if first == 0 else self._current.get("ivf", False)
+        self._commit(self._current["parts"][:first] + [part], dead, keep_ivf, part + 1)
+    
+    def compact(self):
+
+        with self._lock:
+            self._flush()
+            self._refresh()
+            
+            # Already a single clean part, partitioned as its size calls for
+            live = len(self._id_rows)
+            ivf = bool(self.ivf_min_vectors) and live >= self.ivf_min_vectors
+            if len(self.parts) <= 1 and not self.dead.any() and ivf == bool(self._current.get("ivf")):
+                return
+            self._merge(0)
+    
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+
+        if self.centroids is None:
+            return None
+        
+        # Only the partitions closest to the query are scanned
+        nearest = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        return np.concatenate([
+            np.arange(self.list_offsets[list_id], self.list_offsets[list_id + 1])
+            for list_id in nearest
+        ])
+    
+    def query(self, query_embedding, n_results: int) -> List[Dict]:
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        
+        with self._lock:
+            self._refresh()
+            
+            # Exact search is a matrix-vector product per part; IVF narrows the base
+            all_scores = []
+            all_rows = []
+            for index, part in enumerate(self.parts):
+                if len(part["vectors"]) == 0:
+                    continue
+                local_rows = self._candidate_rows(query) if index == 0 else None
+                if local_rows is None:
+                    local_rows = np.arange(len(part["vectors"]))
+                    all_scores.append(part["vectors"] @ query)
+                else:
+                    all_scores.append(part["vectors"][local_rows] @ query)
+                all_rows.append(part["start"] + local_rows)
+            
+            if not all_scores:
+                return []
+            scores = np.concatenate(all_scores)
+            rows = np.concatenate(all_rows)
+            live = ~self.dead[rows]
+            scores = scores[live]
+            rows = rows[live]
+            if len(scores) == 0:
+                return []
+            
+            k = min(n_results, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            records = self._read_records(rows[top])
+        
+        # Squared L2 between unit vectors, the same scale Chroma reports
+        return [
+            {
+                "id": record["id"],
+                "content": record["document"],
+                "metadata": record["metadata"],
+                "distance": float(2.0 - 2.0 * scores[i])
+            }
+            for record, i in zip(records, top)
+        ]
+    
+    def get_all(self, include_embeddings: bool = False) -> Dict[str, list]:
+
+        with self._lock:
+            self._refresh()
+            rows = np.flatnonzero(~self.dead)
+            records = self._read_records(rows)
+            all_records = {
+                "ids": [record["id"] for record in records],
+                "documents": [record["document"] for record in records],
+                "metadatas": [record["metadata"] for record in records]
+            }
+            if include_embeddings:
+                all_records["embeddings"] = self._read_vectors(rows)
+        return all_records
+    
+    def estimated_bytes(self) -> int:
+
+        return directory_size(self.path)
+    
+    def close(self):
+
+        # Drops the memory maps; buffered writes survive and a later query reopens them
+        with self._lock:
+            self.parts = []
+            self._starts = np.zeros(0, dtype=np.int64)
+            self._loaded_mtime = None
+
+def open_vector_store(collection_name: str, metadata: Dict, chroma_base_path: str, backend: Optional[str] = None) -> VectorStore:
+
+    backend = backend or VECTOR_STORE_BACKEND
+    if backend == "numpy":
+        return NumpyVectorStore(os.path.join(NUMPY_INDEX_PATH, collection_name))
+    elif backend == "chroma":
+        return ChromaVectorStore(os.path.join(chroma_base_path, collection_name), collection_name, metadata)
+    else:
+        raise ValueError(f"Unsupported vector store backend: {backend}. Supported backends: chroma, numpy")
@@ -0,0 +1,6 @@
+
+import os
+import sys
+
+# Tests import the backend packages (services, utils) the way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
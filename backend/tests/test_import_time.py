@@ -0,0 +1,88 @@
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+# Importing the API must take no longer than this
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+# Best of several runs, so a busy machine does not fail the check
+IMPORT_TIME_RUNS = int(os.getenv("IMPORT_TIME_RUNS", "3"))
+
+# Libraries that must only load behind the service getters
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "onnxruntime",
+    "chromadb",
+    "langchain_groq",
+    "langchain_core",
+    "fitz",
+    "docx"
+]
+
+MEASURE_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "loaded": [name for name in HEAVY if name in sys.modules]}))
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_once() -> dict:
+
+    # A fresh interpreter, so modules imported by other tests do not count
+    env = dict(os.environ, IMPORT_PROFILE_TOP="0")
+    script = f"HEAVY = {HEAVY_MODULES!r}\n{MEASURE_SCRIPT}"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 0, f"import main failed:\n{result.stderr}"
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def importtime_report(top: int = 10) -> str:
+
+    # The interpreter's own per-module timings, slowest cumulative first
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, IMPORT_PROFILE_TOP="0"),
+        capture_output=True,
+        text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    
+    lines = [f"{'cumulative [ms]':>16} {'self [ms]':>10}  module"]
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        lines.append(f"{cumulative_us / 1000:16.1f} {self_us / 1000:10.1f}  {name}")
+    return "\n".join(lines)
+
+@pytest.fixture(scope="module")
+def import_runs():
+
+    return [measure_once() for _ in range(max(IMPORT_TIME_RUNS, 1))]
+
+def test_startup_does_not_import_heavy_modules(import_runs):
+
+    loaded = import_runs[0]["loaded"]
+    assert not loaded, f"Heavy modules imported at startup: {', '.join(loaded)}"
+
+def test_startup_import_time_within_budget(import_runs):
+
+    best_ms = min(run["ms"] for run in import_runs)
+    assert best_ms <= IMPORT_TIME_BUDGET_MS, (
+        f"Importing the API took {best_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)\n"
+        f"{importtime_report()}"
+    )
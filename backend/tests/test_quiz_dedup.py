@@ -0,0 +1,96 @@
+
+import asyncio
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+import services.cache_service as cache_service
+import services.rag_service as rag_module
+import services.session_dedup as session_dedup_module
+from services.cache_service import ResultCache
+from services.rag_service import RAGService
+from services.session_dedup import SessionDeduplicator
+from utils.llm_limiter import LLMLimiter
+
+def mcq_response(topic: str) -> str:
+
+    return (
+        f"Question 1: What is {topic}?\n"
+        "A) one\nB) two\nC) three\nD) four\n"
+        "Correct Answer: B\n"
+        "Explanation: because"
+    )
+
+class FakeFileService:
+
+    
+    def __init__(self, summaries_path: str):
+        self.summaries_path = summaries_path
+    
+    def get_corpus_version(self, subject: str, unit: str) -> str:
+
+        return "v1"
+    
+    def get_summaries_path(self, subject: str, unit: str) -> str:
+
+        return self.summaries_path
+
+@pytest.fixture
+def rag_service(tmp_path, monkeypatch):
+
+    # A unit small enough that the chunk selector returns the same chunks every time
+    packed = {
+        "text": "The whole unit.",
+        "indices": [0],
+        "chunk_ids": ["chunk_0"],
+        "packed_tokens": 4,
+        "dropped_tokens": 0,
+        "dropped_chunks": 0,
+        "budget": 3000
+    }
+    
+    monkeypatch.setattr(cache_service, "get_file_service", lambda: FakeFileService(str(tmp_path)))
+    result_cache = ResultCache()
+    monkeypatch.setattr(rag_module, "get_result_cache", lambda: result_cache)
+    
+    session_dedup = SessionDeduplicator()
+    monkeypatch.setattr(rag_module, "get_session_dedup", lambda: session_dedup)
+    monkeypatch.setattr(session_dedup_module, "get_embeddings", lambda: DeterministicFakeEmbedding(size=64))
+    
+    service = RAGService.__new__(RAGService)
+    service.llm = FakeListChatModel(responses=[mcq_response(topic) for topic in ("osmosis", "diffusion", "mitosis", "meiosis")])
+    service._output_parser = StrOutputParser()
+    service._llm_limiter = LLMLimiter(4)
+    monkeypatch.setattr(service, "_get_unit_content", lambda subject, unit, budget: dict(packed))
+    return service
+
+def test_same_session_gets_new_question_on_small_unit(rag_service):
+
+    first = rag_service.generate_mcqs("Biology", "Unit 1", 1, "session-1")
+    second = rag_service.generate_mcqs("Biology", "Unit 1", 1, "session-1")
+    
+    assert first["status"] == "success" and first["count"] == 1
+    assert second["status"] == "success" and second["count"] == 1
+    assert second["mcqs"][0]["question"] != first["mcqs"][0]["question"]
+    assert second["rejected_duplicates"] == 1
+
+def test_same_session_gets_new_question_on_small_unit_async(rag_service):
+
+    async def run():
+        first = await rag_service.agenerate_mcqs("Biology", "Unit 1", 1, "session-1")
+        second = await rag_service.agenerate_mcqs("Biology", "Unit 1", 1, "session-1")
+        return first, second
+    
+    first, second = asyncio.run(run())
+    
+    assert first["count"] == 1
+    assert second["count"] == 1
+    assert second["mcqs"][0]["question"] != first["mcqs"][0]["question"]
+
+def test_other_sessions_still_share_cached_questions(rag_service):
+
+    first = rag_service.generate_mcqs("Biology", "Unit 1", 1, "session-1")
+    other = rag_service.generate_mcqs("Biology", "Unit 1", 1, "session-2")
+    
+    assert other["mcqs"] == first["mcqs"]
+    assert other["rejected_duplicates"] == 0
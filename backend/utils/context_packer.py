@@ -0,0 +1,152 @@
+
+import os
+import math
+import threading
+from typing import List, Dict, Callable, Optional
+
+# tokenizer.json of the LLM (e.g. Llama 3) for exact counts; otherwise tiktoken's
+# cl100k_base when installed, otherwise the embedding model's own tokenizer
+# (the tokenizers package comes with sentence-transformers)
+CONTEXT_TOKENIZER_PATH = os.getenv("CONTEXT_TOKENIZER_PATH", "")
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+# Hugging Face cache entry of the embedding tokenizer, used when no local model
+# directory has one; only read from disk, never downloaded
+CONTEXT_TOKENIZER_HUB_ID = os.getenv("CONTEXT_TOKENIZER_HUB_ID", "sentence-transformers/all-MiniLM-L6-v2")
+# Characters per token when no tokenizer is available at all
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "4"))
+
+# Context budgets in tokens for each kind of prompt
+CONTEXT_TOKENS_ASK = int(os.getenv("CONTEXT_TOKENS_ASK", "2000"))
+CONTEXT_TOKENS_SUMMARY = int(os.getenv("CONTEXT_TOKENS_SUMMARY", "4000"))
+CONTEXT_TOKENS_QUIZ = int(os.getenv("CONTEXT_TOKENS_QUIZ", "3000"))
+
+_counter = None
+_counter_name = None
+_counter_lock = threading.Lock()
+
+# Running totals over every packed prompt in this process
+_totals = {"prompts": 0, "packed_tokens": 0, "dropped_tokens": 0, "dropped_chunks": 0}
+_totals_lock = threading.Lock()
+
+def _tokenizer_counter(tokenizer, name: str) -> Callable[[str], int]:
+
+    global _counter_name
+    
+    # Embedding tokenizers truncate to the model's sequence length; counts must not
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    _counter_name = f"tokenizers:{name}"
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+def _file_counter(path: str) -> Callable[[str], int]:
+
+    from tokenizers import Tokenizer
+    
+    return _tokenizer_counter(Tokenizer.from_file(path), os.path.basename(os.path.dirname(path)) or path)
+
+def _load_counter() -> Callable[[str], int]:
+
+    global _counter_name
+    
+    if CONTEXT_TOKENIZER_PATH and os.path.exists(CONTEXT_TOKENIZER_PATH):
+        try:
+            return _file_counter(CONTEXT_TOKENIZER_PATH)
+        except Exception as e:
+            print(f"Error loading tokenizer {CONTEXT_TOKENIZER_PATH}: {str(e)}")
+    
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        _counter_name = f"tiktoken:{TIKTOKEN_ENCODING}"
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        pass
+    
+    # A subword tokenizer counts close to the LLM's, unlike a characters-per-token guess
+    from utils.hf_embeddings import EMBEDDING_MODEL_DIR, ONNX_MODEL_DIR
+    for model_dir in (EMBEDDING_MODEL_DIR, ONNX_MODEL_DIR):
+        path = os.path.join(model_dir, "tokenizer.json")
+        if os.path.exists(path):
+            try:
+                return _file_counter(path)
+            except Exception as e:
+                print(f"Error loading tokenizer {path}: {str(e)}")
+    
+    # The model itself may have come from the Hugging Face cache instead; a
+    # lookup on disk only, so an offline server does not wait on hub retries
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        path = try_to_load_from_cache(CONTEXT_TOKENIZER_HUB_ID, "tokenizer.json")
+        if isinstance(path, str):
+            from tokenizers import Tokenizer
+            return _tokenizer_counter(Tokenizer.from_file(path), CONTEXT_TOKENIZER_HUB_ID)
+    except Exception as e:
+        print(f"Error loading tokenizer {CONTEXT_TOKENIZER_HUB_ID}: {str(e)}")
+    
+    # Budgets are approximate from here on; warn once rather than fail every prompt
+    print(
+        "Warning: no tokenizer available for context packing, estimating "
+        f"{CONTEXT_CHARS_PER_TOKEN:g} characters per token. Set CONTEXT_TOKENIZER_PATH to a "
+        "tokenizer.json, install tiktoken, or run download_model.py to save the "
+        f"embedding model (and its tokenizer) to {EMBEDDING_MODEL_DIR}"
+    )
+    _counter_name = f"estimate:{CONTEXT_CHARS_PER_TOKEN:g}-chars-per-token"
+    return lambda text: math.ceil(len(text) / CONTEXT_CHARS_PER_TOKEN)
+
+def load_tokenizer():
+
+    # Resolved once per process, at startup; the result (even the estimate) is
+    # kept, so requests never repeat the search
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = _load_counter()
+
+def count_tokens(text: str) -> int:
+
+    if _counter is None:
+        load_tokenizer()
+    return _counter(text)
+
+def pack_chunks(chunks: List[str], budget: int, separator: str = "\n\n") -> Dict:
+
+    # Whole chunks in the given order; a chunk that does not fit is dropped and
+    # smaller ones after it may still be packed
+    separator_tokens = count_tokens(separator)
+    packed = []
+    indices = []
+    packed_tokens = 0
+    dropped_tokens = 0
+    
+    for i, chunk in enumerate(chunks):
+        tokens = count_tokens(chunk)
+        cost = tokens + (separator_tokens if packed else 0)
+        if packed_tokens + cost > budget:
+            dropped_tokens += tokens
+            continue
+        packed.append(chunk)
+        indices.append(i)
+        packed_tokens += cost
+    
+    with _totals_lock:
+        _totals["prompts"] += 1
+        _totals["packed_tokens"] += packed_tokens
+        _totals["dropped_tokens"] += dropped_tokens
+        _totals["dropped_chunks"] += len(chunks) - len(packed)
+    
+    return {
+        "text": separator.join(packed),
+        "indices": indices,
+        "packed_tokens": packed_tokens,
+        "dropped_tokens": dropped_tokens,
+        "dropped_chunks": len(chunks) - len(packed),
+        "budget": budget
+    }
+
+def packing_stats() -> Dict:
+
+    with _totals_lock:
+        stats = dict(_totals)
+    stats["tokenizer"] = _counter_name
+    return stats
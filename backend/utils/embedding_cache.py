@@ -0,0 +1,140 @@
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import List, Dict, Optional
+
+# Persistent cache of chunk vectors keyed by (model id, sha256 of chunk text)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/vectors.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+class EmbeddingCache:
+
+    
+    def __init__(self, db_path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_last_used ON vectors(last_used)")
+        self._conn.commit()
+    
+    def _make_key(self, model_name: str, text: str) -> str:
+
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+    
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+
+        keys = [self._make_key(model_name, text) for text in texts]
+        found = {}
+        
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE vectors SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+            
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        
+        return [
+            np.frombuffer(found[key], dtype=np.float32) if key in found else None
+            for key in keys
+        ]
+    
+    def put_many(self, model_name: str, texts: List[str], vectors):
+
+        now = time.time()
+        rows = [
+            (self._make_key(model_name, text), model_name, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self):
+
+        count = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        
+        # Trim to 90% so eviction does not run on every insert
+        excess = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+    
+    def embed_documents(self, embeddings, texts: List[str], bulk: bool = False) -> np.ndarray:
+
+        if not texts:
+            return np.zeros((0, embeddings.get_embedding_dimension()), dtype=np.float32)
+        
+        cached = self.get_many(embeddings.model_id, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        
+        # Only chunks never seen with this model go through the encoder
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            if bulk:
+                new_vectors = embeddings.embed_documents_bulk(missing_texts)
+            else:
+                new_vectors = embeddings.embed_documents(missing_texts)
+            self.put_many(embeddings.model_id, missing_texts, new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                cached[i] = vector
+        
+        return np.stack(cached).astype(np.float32, copy=False)
+    
+    def stats(self) -> Dict:
+
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+# Global instance (lazy loaded)
+_embedding_cache_instance = None
+
+def get_embedding_cache() -> EmbeddingCache:
+
+    global _embedding_cache_instance
+    if _embedding_cache_instance is None:
+        _embedding_cache_instance = EmbeddingCache()
+    return _embedding_cache_instance
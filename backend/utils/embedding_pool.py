@@ -0,0 +1,138 @@
+
+import os
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+# Worker processes that encode chunks during ingest (0 encodes in the server process)
+EMBED_BULK_WORKERS = int(os.getenv("EMBED_BULK_WORKERS", str(max((os.cpu_count() or 2) // 2, 1))))
+# Cores the workers are pinned to, e.g. "4,5,6,7"; defaults to the highest-numbered ones
+EMBED_BULK_CPUS = os.getenv("EMBED_BULK_CPUS", "")
+# Smallest slice of a batch worth sending to a separate worker
+EMBED_BULK_MIN_SLICE = int(os.getenv("EMBED_BULK_MIN_SLICE", "16"))
+
+# Per-worker model, loaded once by the initializer
+_worker_embeddings = None
+
+def _available_cpus() -> List[int]:
+
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def _resolve_bulk_cpus(workers: int) -> List[int]:
+
+    if EMBED_BULK_CPUS:
+        return [int(cpu) for cpu in EMBED_BULK_CPUS.split(",") if cpu.strip()]
+    
+    # Low-numbered cores stay with the web server
+    return _available_cpus()[-workers:]
+
+def _init_worker(model_name: str, backend: str, cpus: List[int], threads: int):
+
+    global _worker_embeddings
+    
+    # Pinning is Linux-only; elsewhere the lower priority still keeps /ask responsive
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            print(f"Error pinning embedding worker to CPUs {cpus}: {str(e)}")
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+    
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+    
+    from utils.hf_embeddings import HuggingFaceEmbeddings
+    _worker_embeddings = HuggingFaceEmbeddings(model_name, backend)
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+
+    # Module-level so it can run in a worker process
+    return _worker_embeddings.embed_documents(texts)
+
+class EmbeddingPool:
+
+    
+    def __init__(self, model_name: str, backend: str, workers: int = EMBED_BULK_WORKERS, min_slice: int = EMBED_BULK_MIN_SLICE):
+        self.model_name = model_name
+        self.backend = backend
+        self.workers = workers
+        self.min_slice = max(min_slice, 1)
+        self.cpus = _resolve_bulk_cpus(workers) if workers > 0 else []
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+
+        with self._lock:
+            if self._executor is None:
+                # Share the pinned cores between workers, at least one thread each
+                threads = max(len(self.cpus) // self.workers, 1)
+                
+                # spawn, not fork: the server process already runs torch and threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.backend, self.cpus, threads)
+                )
+            return self._executor
+    
+    def encode(self, texts: List[str]) -> Optional[np.ndarray]:
+
+        if self.workers <= 0 or not texts:
+            return None
+        
+        from utils.hf_embeddings import length_order
+        
+        # Each worker gets texts of similar length, results go back to input order
+        order = length_order(texts)
+        slice_size = max(-(-len(texts) // self.workers), self.min_slice)
+        slices = [order[start:start + slice_size] for start in range(0, len(texts), slice_size)]
+        futures = [
+            self._get_executor().submit(_encode_in_worker, [texts[i] for i in indices])
+            for indices in slices
+        ]
+        
+        embeddings = None
+        try:
+            for indices, future in zip(slices, futures):
+                result = future.result()
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), result.shape[1]), dtype=np.float32)
+                embeddings[indices] = result
+        except Exception:
+            # A crashed worker breaks the whole executor; start fresh next time
+            self.shutdown()
+            raise
+        return embeddings
+    
+    def shutdown(self):
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# Global instance (lazy loaded)
+_embedding_pool_instance = None
+
+def get_embedding_pool(model_name: str, backend: str) -> EmbeddingPool:
+
+    global _embedding_pool_instance
+    if _embedding_pool_instance is None:
+        _embedding_pool_instance = EmbeddingPool(model_name, backend)
+    return _embedding_pool_instance
+
+def shutdown_embedding_pool():
+
+    if _embedding_pool_instance is not None:
+        _embedding_pool_instance.shutdown()
@@ -0,0 +1,275 @@
+
+import os
+import sys
+import time
+import socket
+import struct
+import threading
+import socketserver
+import numpy as np
+from concurrent.futures import Future
+from typing import List, Tuple
+
+# Unix socket of the shared embedding process; when set, API workers use a client
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "")
+# How long a client waits for the server to come up before giving up
+EMBEDDING_SERVER_CONNECT_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_CONNECT_TIMEOUT", "60"))
+
+# Wire format, little-endian:
+#   request  = op:u8 count:u32, then count x (length:u32, utf-8 bytes)
+#   response = status:u8 rows:u32 dim:u32, then rows*dim float32
+#   errors   = status 1, rows holds the length of the utf-8 message that follows
+#   OP_INFO  = status 0, dimension:u32 length:u32, then the utf-8 model id
+OP_DOCUMENTS = 1
+OP_DOCUMENTS_BULK = 2
+OP_QUERY = 3
+OP_INFO = 4
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct("<BI")
+RESPONSE_HEADER = struct.Struct("<BII")
+LENGTH = struct.Struct("<I")
+
+# Rejects garbage before allocating for it
+MAX_TEXTS_PER_REQUEST = 100000
+MAX_TEXT_BYTES = 16 * 1024 * 1024
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            raise ConnectionError("Embedding server connection closed")
+        received += count
+    return bytes(buffer)
+
+def _encode_texts(op: int, texts: List[str]) -> bytes:
+
+    parts = [REQUEST_HEADER.pack(op, len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(LENGTH.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+def _read_texts(sock: socket.socket) -> Tuple[int, List[str]]:
+
+    op, count = REQUEST_HEADER.unpack(_recv_exact(sock, REQUEST_HEADER.size))
+    if count > MAX_TEXTS_PER_REQUEST:
+        raise ValueError(f"Too many texts in one request: {count}")
+    
+    texts = []
+    for _ in range(count):
+        (length,) = LENGTH.unpack(_recv_exact(sock, LENGTH.size))
+        if length > MAX_TEXT_BYTES:
+            raise ValueError(f"Text too large: {length} bytes")
+        texts.append(_recv_exact(sock, length).decode("utf-8"))
+    return op, texts
+
+def _read_matrix(sock: socket.socket) -> np.ndarray:
+
+    status, rows, dim = RESPONSE_HEADER.unpack(_recv_exact(sock, RESPONSE_HEADER.size))
+    if status == STATUS_ERROR:
+        raise RuntimeError(_recv_exact(sock, rows).decode("utf-8"))
+    
+    data = _recv_exact(sock, rows * dim * 4)
+    return np.frombuffer(data, dtype="<f4").reshape(rows, dim)
+
+def _read_info(sock: socket.socket) -> Tuple[int, str]:
+
+    _, dim, length = RESPONSE_HEADER.unpack(_recv_exact(sock, RESPONSE_HEADER.size))
+    return dim, _recv_exact(sock, length).decode("utf-8")
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+
+    
+    def handle(self):
+
+        embeddings = self.server.embeddings
+        
+        # Connections are persistent; one request after another until the client leaves
+        while True:
+            try:
+                op, texts = _read_texts(self.request)
+            except (ConnectionError, OSError):
+                return
+            except ValueError as e:
+                self._send_error(str(e))
+                return
+            
+            try:
+                if op == OP_QUERY:
+                    # Goes through the micro-batcher, so queries from all workers share passes
+                    futures = [embeddings.embed_query_future(text) for text in texts]
+                    vectors = np.array([future.result() for future in futures], dtype="<f4")
+                elif op == OP_DOCUMENTS:
+                    vectors = embeddings.embed_documents(texts)
+                elif op == OP_DOCUMENTS_BULK:
+                    vectors = embeddings.embed_documents_bulk(texts)
+                elif op == OP_INFO:
+                    self._send_info(embeddings)
+                    continue
+                else:
+                    raise ValueError(f"Unknown embedding server operation: {op}")
+            except Exception as e:
+                print(f"Error serving embedding request: {str(e)}")
+                self._send_error(str(e))
+                continue
+            
+            vectors = np.ascontiguousarray(vectors, dtype="<f4").reshape(len(texts), embeddings.get_embedding_dimension())
+            self.request.sendall(RESPONSE_HEADER.pack(STATUS_OK, vectors.shape[0], vectors.shape[1]) + vectors.tobytes())
+    
+    def _send_info(self, embeddings):
+
+        model_id = embeddings.model_id.encode("utf-8")
+        header = RESPONSE_HEADER.pack(STATUS_OK, embeddings.get_embedding_dimension(), len(model_id))
+        self.request.sendall(header + model_id)
+    
+    def _send_error(self, message: str):
+
+        data = message.encode("utf-8")
+        self.request.sendall(RESPONSE_HEADER.pack(STATUS_ERROR, len(data), 0) + data)
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    
+    daemon_threads = True
+    
+    def __init__(self, socket_path: str, embeddings):
+        self.embeddings = embeddings
+        
+        # A socket file left by a crashed server would make bind fail
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _EmbeddingRequestHandler)
+        
+        # Only processes of the same user (and group) may connect
+        os.chmod(socket_path, 0o660)
+
+class EmbeddingClient:
+
+    
+    def __init__(self, socket_path: str = EMBEDDING_SERVER_SOCKET, connect_timeout: float = EMBEDDING_SERVER_CONNECT_TIMEOUT):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.backend = "server"
+        self._local = threading.local()
+        self._info = None
+        self._info_lock = threading.Lock()
+    
+    def _connect(self) -> socket.socket:
+
+        # The server may still be loading its model after a deploy
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except OSError:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Embedding server not reachable at {self.socket_path}")
+                time.sleep(0.2)
+    
+    def _request(self, payload: bytes, read_response):
+
+        # One connection per thread, reopened once if the server restarted
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                sock.sendall(payload)
+                return read_response(sock)
+            except (ConnectionError, OSError):
+                sock.close()
+                self._local.sock = None
+                if attempt == 1:
+                    raise
+    
+    def _get_info(self) -> Tuple[int, str]:
+
+        with self._info_lock:
+            if self._info is None:
+                self._info = self._request(_encode_texts(OP_INFO, []), _read_info)
+            return self._info
+    
+    @property
+    def model_id(self) -> str:
+
+        # Cache keys follow the model the server actually runs
+        return self._get_info()[1]
+    
+    @property
+    def model_name(self) -> str:
+
+        return self.model_id.split(":", 1)[0]
+    
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+
+        return self._request(_encode_texts(OP_DOCUMENTS, texts), _read_matrix)
+    
+    def embed_documents_bulk(self, texts: List[str]) -> np.ndarray:
+
+        return self._request(_encode_texts(OP_DOCUMENTS_BULK, texts), _read_matrix)
+    
+    def embed_query(self, text: str) -> List[float]:
+
+        return self._request(_encode_texts(OP_QUERY, [text]), _read_matrix)[0].tolist()
+    
+    def embed_query_future(self, text: str) -> Future:
+
+        future = Future()
+        try:
+            future.set_result(self.embed_query(text))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def warm_up(self):
+
+        # Waits for the server and primes this worker's connection
+        self._get_info()
+        self.embed_query("warm up")
+    
+    def get_embedding_dimension(self) -> int:
+
+        return self._get_info()[0]
+
+def serve(socket_path: str = EMBEDDING_SERVER_SOCKET):
+
+    from utils.hf_embeddings import HuggingFaceEmbeddings
+    
+    if not socket_path:
+        raise ValueError("EMBEDDING_SERVER_SOCKET is not set")
+    
+    embeddings = HuggingFaceEmbeddings()
+    embeddings.warm_up()
+    
+    server = EmbeddingServer(socket_path, embeddings)
+    print(f"✓ Embedding server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+if __name__ == "__main__":
+    # Run from backend/: python -m utils.embedding_server
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    try:
+        serve(os.getenv("EMBEDDING_SERVER_SOCKET", EMBEDDING_SERVER_SOCKET))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        sys.exit(1)
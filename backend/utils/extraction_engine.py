@@ -0,0 +1,173 @@
+
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Dict, Iterator, Tuple, Callable, Optional
+from utils.text_extractor import (
+    iter_text,
+    iter_text_cached,
+    get_pdf_page_count,
+    extract_pdf_page_range,
+    compute_file_hash,
+    load_sidecar,
+    write_sidecar
+)
+
+# Worker processes used for text extraction (0 extracts in the calling thread)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(max((os.cpu_count() or 2) - 1, 1))))
+# Pages handed to a worker per task when splitting a large PDF
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Documents extracted ahead of the one currently being consumed
+EXTRACTION_PREFETCH = int(os.getenv("EXTRACTION_PREFETCH", "2"))
+
+def _extract_all_pieces(file_path: str) -> List[str]:
+
+    # Module-level so it can run in a worker process
+    return list(iter_text(file_path))
+
+def _iter_text_lazily(file_path: str, file_hash: Optional[str] = None) -> Iterator[str]:
+
+    # Defers errors such as a missing file until the document is consumed
+    yield from iter_text_cached(file_path, file_hash)
+
+class _DocumentStream:
+
+    
+    def __init__(self, engine: "ExtractionEngine", file_path: str, file_hash: Optional[str] = None):
+        self.engine = engine
+        self.file_path = file_path
+        self.pending = deque()
+        self.tasks = deque()
+        self.cached = None
+        self.error = None
+        
+        try:
+            self.file_hash = file_hash or compute_file_hash(file_path)
+            
+            # Unchanged documents are read back from their sidecar, no parsing needed
+            self.cached = load_sidecar(file_path, self.file_hash)
+            
+            # Work is described up front, submitted lazily in a bounded window
+            if self.cached is None:
+                self.tasks = deque(self._plan_tasks())
+        except Exception as e:
+            self.error = e
+    
+    def _plan_tasks(self) -> List[Tuple[Callable, tuple]]:
+
+        _, ext = os.path.splitext(self.file_path.lower())
+        if ext != '.pdf':
+            return [(_extract_all_pieces, (self.file_path,))]
+        
+        page_count = get_pdf_page_count(self.file_path)
+        step = self.engine.pages_per_task
+        return [
+            (extract_pdf_page_range, (self.file_path, start, start + step))
+            for start in range(0, page_count, step)
+        ]
+    
+    def fill(self, window: int):
+
+        while self.tasks and len(self.pending) < window:
+            fn, args = self.tasks.popleft()
+            self.pending.append(self.engine.submit(fn, *args))
+    
+    def _iter_results(self, window: int) -> Iterator[str]:
+
+        self.fill(window)
+        
+        # Results are consumed in submission order, so pages come out in order
+        # even though page ranges finish out of order
+        while self.pending:
+            future = self.pending.popleft()
+            pieces = future.result()
+            self.fill(window)
+            yield from pieces
+    
+    def iter_pieces(self, window: int) -> Iterator[str]:
+
+        if self.error:
+            raise self.error
+        
+        if self.cached is not None:
+            yield from self.cached
+        else:
+            yield from write_sidecar(self.file_path, self.file_hash, self._iter_results(window))
+    
+    def cancel(self):
+
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.tasks.clear()
+
+class ExtractionEngine:
+
+    
+    def __init__(self, max_workers: int = EXTRACTION_WORKERS, pages_per_task: int = PDF_PAGES_PER_TASK, prefetch: int = EXTRACTION_PREFETCH):
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self.prefetch = prefetch
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def submit(self, fn: Callable, *args) -> Future:
+
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: forking the threaded server process can copy
+                # locks held by other threads into the child
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor.submit(fn, *args)
+    
+    def iter_documents(self, file_paths: List[str], file_hashes: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, Iterator[str]]]:
+
+        # Known content hashes (by path) save re-hashing for the sidecar lookup
+        file_hashes = file_hashes or {}
+        
+        # Without workers fall back to plain streaming extraction
+        if self.max_workers <= 0:
+            for file_path in file_paths:
+                yield file_path, _iter_text_lazily(file_path, file_hashes.get(file_path))
+            return
+        
+        # Enough outstanding page ranges to keep every worker busy
+        window = self.max_workers * 2
+        streams = [
+            _DocumentStream(self, file_path, file_hashes.get(file_path))
+            for file_path in file_paths
+        ]
+        
+        try:
+            for i, stream in enumerate(streams):
+                # Start the next documents while this one is being consumed
+                for upcoming in streams[i + 1:i + 1 + self.prefetch]:
+                    upcoming.fill(max(window // 2, 1))
+                
+                yield stream.file_path, stream.iter_pieces(window)
+                stream.cancel()
+        finally:
+            for stream in streams:
+                stream.cancel()
+    
+    def shutdown(self):
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# Global instance (lazy loaded)
+_extraction_engine_instance = None
+
+def get_extraction_engine() -> ExtractionEngine:
+
+    global _extraction_engine_instance
+    if _extraction_engine_instance is None:
+        _extraction_engine_instance = ExtractionEngine()
+    return _extraction_engine_instance
@@ -1,31 +1,204 @@
 
-from sentence_transformers import SentenceTransformer
 import os
-from typing import List
+import numpy as np
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Callable, Optional
+
+# Concurrent embed_query calls are encoded together, up to this many per batch
+EMBED_QUERY_MAX_BATCH = int(os.getenv("EMBED_QUERY_MAX_BATCH", "32"))
+# How long the first query in a batch may wait for others to join it
+EMBED_QUERY_MAX_WAIT_MS = float(os.getenv("EMBED_QUERY_MAX_WAIT_MS", "2"))
+
+# "torch" runs the SentenceTransformer model, "onnx" the int8 export from export_onnx.py
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./models/all-MiniLM-L6-v2-onnx")
+
+# Pinned local copy written by download_model.py; loaded without touching the network
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", "./models/all-MiniLM-L6-v2")
+
+# Texts per forward pass when encoding documents
+EMBED_ENCODE_BATCH_SIZE = int(os.getenv("EMBED_ENCODE_BATCH_SIZE", "32"))
+
+# Startup warm-up attempts before /ready reports the embedding model as failed
+EMBEDDING_WARM_UP_ATTEMPTS = int(os.getenv("EMBEDDING_WARM_UP_ATTEMPTS", "5"))
+# Wait before the first warm-up retry, doubled after each further failure
+EMBEDDING_WARM_UP_BACKOFF_SECONDS = float(os.getenv("EMBEDDING_WARM_UP_BACKOFF_SECONDS", "2"))
+
+def length_order(texts: List[str]) -> np.ndarray:
+
+    # Longest first, so each batch holds texts of similar length and pads little
+    return np.argsort([-len(text) for text in texts], kind="stable")
+
+def encode_in_length_buckets(model, texts: List[str], batch_size: int = EMBED_ENCODE_BATCH_SIZE) -> np.ndarray:
+
+    order = length_order(texts)
+    embeddings = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    
+    for start in range(0, len(texts), batch_size):
+        bucket = order[start:start + batch_size]
+        embeddings[bucket] = model.encode(
+            [texts[i] for i in bucket],
+            batch_size=batch_size,
+            convert_to_numpy=True
+        )
+    
+    # Rows were written back at their original positions
+    return embeddings
+
+class QueryBatcher:
+
+    
+    def __init__(self, encode_fn: Callable, max_batch: int = EMBED_QUERY_MAX_BATCH, max_wait_ms: float = EMBED_QUERY_MAX_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max(max_wait_ms, 0) / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+    
+    def submit(self, text: str) -> Future:
+
+        future = Future()
+        self._ensure_started()
+        self._queue.put((text, future))
+        return future
+    
+    def _ensure_started(self):
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-embedding-batcher", daemon=True)
+                self._thread.start()
+    
+    def _collect(self) -> list:
+
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        
+        # Take everything already waiting, then give stragglers until the deadline
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector.tolist())
+    
+    def stats(self) -> dict:
+
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0
+        }
 
 class HuggingFaceEmbeddings:
 
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: str = EMBEDDING_BACKEND):
 
         self.model_name = model_name
-        print(f"Loading embedding model: {model_name}...")
-        print("Note: Model will be downloaded on first use and cached locally.")
+        self.backend = backend
+        
+        # Quantized vectors differ slightly, so caches keep them apart from fp32 ones
+        self.model_id = model_name if backend == "torch" else f"{model_name}:{backend}"
+        
+        if backend == "onnx":
+            from utils.onnx_encoder import OnnxSentenceEncoder
+            
+            print(f"Loading ONNX embedding model from {ONNX_MODEL_DIR}...")
+            self.model = OnnxSentenceEncoder(ONNX_MODEL_DIR)
+            print(f"✓ ONNX model for '{model_name}' loaded successfully!")
+        elif backend == "torch":
+            self.model = self._load_torch_model(model_name)
+        else:
+            raise ValueError(f"Unsupported embedding backend: {backend}. Supported backends: torch, onnx")
+        
+        # One forward pass serves every query that arrives within the batching window
+        self.query_batcher = QueryBatcher(
+            lambda texts: self.model.encode(texts, convert_to_numpy=True)
+        )
+    
+    def _load_torch_model(self, model_name: str):
+
+        # Deferred so importing this module does not pull in torch
+        from sentence_transformers import SentenceTransformer
+        
+        if os.path.isdir(EMBEDDING_MODEL_DIR):
+            # safetensors weights are memory-mapped and no hub lookup is made
+            print(f"Loading embedding model from {EMBEDDING_MODEL_DIR}...")
+            model = SentenceTransformer(EMBEDDING_MODEL_DIR, device="cpu", local_files_only=True)
+        else:
+            print(f"Loading embedding model: {model_name}...")
+            print("Note: Model will be downloaded on first use and cached locally.")
+            print("Run download_model.py to pin a local copy for offline startup.")
+            
+            # Load model - it will download to cache if not present
+            # Cache location: ~/.cache/torch/sentence_transformers/
+            model = SentenceTransformer(model_name)
         
-        # Load model - it will download to cache if not present
-        # Cache location: ~/.cache/torch/sentence_transformers/
-        self.model = SentenceTransformer(model_name)
         print(f"✓ Model '{model_name}' loaded successfully!")
+        return model
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
 
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+        return encode_in_length_buckets(self.model, texts)
+    
+    def embed_documents_bulk(self, texts: List[str]) -> np.ndarray:
+
+        from utils.embedding_pool import get_embedding_pool
+        
+        # Large ingests run in the pinned worker pool, away from request handling
+        try:
+            embeddings = get_embedding_pool(self.model_name, self.backend).encode(texts)
+        except Exception as e:
+            print(f"Error in embedding pool, encoding in process: {str(e)}")
+            embeddings = None
+        
+        if embeddings is None:
+            return self.embed_documents(texts)
+        return embeddings
     
     def embed_query(self, text: str) -> List[float]:
 
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+        return self.embed_query_future(text).result()
+    
+    def embed_query_future(self, text: str) -> Future:
+
+        return self.query_batcher.submit(text)
+    
+    def warm_up(self):
+
+        # First calls pay for allocator growth and kernel selection; do that now
+        # with a short and a full-length input instead of on a student's request
+        self.embed_documents(["warm up", "warm up " * 200])
+        self.embed_query("warm up")
     
     def get_embedding_dimension(self) -> int:
 
@@ -33,10 +206,50 @@ class HuggingFaceEmbeddings:
 
 # Global instance (lazy loaded)
 _embeddings_instance = None
+_embeddings_lock = threading.Lock()
+_embeddings_ready = threading.Event()
+# Last warm-up error once every attempt has failed
+_embeddings_error = None
 
 def get_embeddings(model_name: str = "all-MiniLM-L6-v2") -> HuggingFaceEmbeddings:
 
     global _embeddings_instance
-    if _embeddings_instance is None:
-        _embeddings_instance = HuggingFaceEmbeddings(model_name)
+    # Startup warm-up and early requests may race to load the model
+    with _embeddings_lock:
+        if _embeddings_instance is None:
+            from utils.embedding_server import EMBEDDING_SERVER_SOCKET, EmbeddingClient
+            
+            # With a sidecar every API worker shares its model instead of loading one
+            if EMBEDDING_SERVER_SOCKET:
+                _embeddings_instance = EmbeddingClient(EMBEDDING_SERVER_SOCKET)
+            else:
+                _embeddings_instance = HuggingFaceEmbeddings(model_name)
     return _embeddings_instance
+
+def warm_up_embeddings():
+
+    global _embeddings_error
+    # A sidecar that is still starting or a briefly unavailable model file
+    # should not leave the worker unready for its whole life
+    delay = EMBEDDING_WARM_UP_BACKOFF_SECONDS
+    for attempt in range(1, EMBEDDING_WARM_UP_ATTEMPTS + 1):
+        try:
+            get_embeddings().warm_up()
+            _embeddings_ready.set()
+            print("✓ Embedding model warmed up")
+            return
+        except Exception as e:
+            print(f"Error warming up embedding model (attempt {attempt}/{EMBEDDING_WARM_UP_ATTEMPTS}): {str(e)}")
+            if attempt == EMBEDDING_WARM_UP_ATTEMPTS:
+                _embeddings_error = str(e)
+                return
+        time.sleep(delay)
+        delay *= 2
+
+def is_embeddings_ready() -> bool:
+
+    return _embeddings_ready.is_set()
+
+def embeddings_error() -> Optional[str]:
+
+    return _embeddings_error
@@ -0,0 +1,87 @@
+
+import os
+import sys
+import time
+import builtins
+import threading
+from typing import Dict, List, Tuple
+
+# Slowest imports printed at boot (0 disables the report)
+IMPORT_PROFILE_TOP = int(os.getenv("IMPORT_PROFILE_TOP", "15"))
+
+class ImportProfiler:
+
+    
+    def __init__(self):
+        # module name -> [self seconds, cumulative seconds]
+        self.timings = {}
+        self._original_import = None
+        self._local = threading.local()
+        self._started_at = None
+        self.total_seconds = 0.0
+    
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+
+        # Already loaded modules cost nothing; relative imports count towards
+        # the package doing them
+        if level != 0 or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            
+            # Like -X importtime: self excludes nested imports, cumulative includes them
+            if name in sys.modules:
+                entry = self.timings.setdefault(name, [0.0, 0.0])
+                entry[0] += elapsed - children
+                entry[1] += elapsed
+    
+    def start(self) -> "ImportProfiler":
+
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+        self._started_at = time.perf_counter()
+        return self
+    
+    def stop(self):
+
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+            self.total_seconds = time.perf_counter() - self._started_at
+    
+    def slowest(self, top: int) -> List[Tuple[str, float, float]]:
+
+        ranked = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+        return [(name, timing[0], timing[1]) for name, timing in ranked[:top]]
+    
+    def report(self, top: int = IMPORT_PROFILE_TOP):
+
+        if top <= 0:
+            return
+        
+        print(f"Startup imports took {self.total_seconds * 1000:.0f} ms, slowest:")
+        print("import time:       self [us] |  cumulative | imported package")
+        for name, self_seconds, cumulative_seconds in self.slowest(top):
+            print(f"import time: {self_seconds * 1e6:15.0f} | {cumulative_seconds * 1e6:11.0f} | {name}")
+    
+    def stats(self) -> Dict:
+
+        return {
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "slowest": [
+                {"module": name, "self_ms": round(self_seconds * 1000, 1), "cumulative_ms": round(cumulative_seconds * 1000, 1)}
+                for name, self_seconds, cumulative_seconds in self.slowest(IMPORT_PROFILE_TOP or 15)
+            ]
+        }
@@ -0,0 +1,98 @@
+
+import asyncio
+import threading
+from collections import deque
+from typing import Dict
+
+class LLMLimiter:
+
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._active = 0
+        # Waiting callers in arrival order: (None, threading.Event) for threads,
+        # (event loop, future) for coroutines
+        self._waiters = deque()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            event = threading.Event()
+            self._waiters.append((None, event))
+        
+        # release() hands its slot straight to the waiter
+        event.wait()
+    
+    async def aacquire(self):
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+                    raise
+            # The slot was already handed over; pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+    
+    def release(self):
+
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            loop, waiter = self._waiters.popleft()
+        
+        if loop is None:
+            waiter.set()
+            return
+        try:
+            loop.call_soon_threadsafe(self._hand_over, waiter)
+        except RuntimeError:
+            # The waiter's loop has closed; the next waiter gets the slot
+            self.release()
+    
+    def _hand_over(self, future: asyncio.Future):
+
+        # Runs on the waiter's loop; a waiter cancelled meanwhile passes the slot on
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+    
+    def __enter__(self):
+
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+
+        self.release()
+    
+    async def __aenter__(self):
+
+        await self.aacquire()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+
+        self.release()
+    
+    def stats(self) -> Dict:
+
+        with self._lock:
+            return {"limit": self.limit, "active": self._active, "waiting": len(self._waiters)}
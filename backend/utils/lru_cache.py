@@ -0,0 +1,82 @@
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class LRUCache:
+
+    
+    def __init__(self, max_size: int = 256, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # key -> (value, expires_at), least recently used first
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+
+        with self._lock:
+            entry = self._data.get(key)
+            
+            # Expired entries count as misses and are dropped on sight
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                del self._data[key]
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            # Mark as most recently used
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def set(self, key: Hashable, value: Any):
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            
+            # Evict least recently used entries
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable) -> Optional[Any]:
+
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[0] if entry else None
+    
+    def remove_if(self, predicate: Callable[[Hashable], bool]) -> int:
+
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+    
+    def clear(self):
+
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict:
+
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,74 @@
+
+import os
+import json
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+from typing import List, Union
+
+# File names written by export_onnx.py
+ONNX_MODEL_FILE = "model_quantized.onnx"
+ONNX_ENCODER_CONFIG_FILE = "encoder_config.json"
+
+class OnnxSentenceEncoder:
+
+    
+    def __init__(self, model_dir: str, model_file: str = ONNX_MODEL_FILE):
+
+        with open(os.path.join(model_dir, ONNX_ENCODER_CONFIG_FILE), 'r') as f:
+            self.config = json.load(f)
+        
+        self.max_seq_length = self.config["max_seq_length"]
+        self.dimension = self.config["dimension"]
+        
+        # Same truncation and padding as the sentence-transformers pipeline
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=self.config.get("pad_token_id", 0), pad_token=self.config.get("pad_token", "[PAD]"))
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        
+        token_embeddings = self.session.run(None, inputs)[0]
+        
+        # Mean pooling over real tokens, then L2 normalization (all-MiniLM-L6-v2 pipeline)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config.get("normalize", True):
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+
+        # Mirrors SentenceTransformer.encode: a single string gives a single vector
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        
+        embeddings = np.concatenate([
+            self._encode_batch(texts[start:start + batch_size])
+            for start in range(0, len(texts), batch_size)
+        ])
+        return embeddings[0] if single else embeddings
+    
+    def get_sentence_embedding_dimension(self) -> int:
+
+        return self.dimension
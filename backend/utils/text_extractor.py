@@ -1,25 +1,68 @@
 
 import os
-import fitz  # PyMuPDF
-from docx import Document
-from typing import Optional
+import gzip
+import json
+import hashlib
+from typing import Optional, Iterable, Iterator, List, Tuple
+
+# Block size used when streaming plain text files
+TXT_READ_BLOCK_SIZE = 64 * 1024
+
+# Bump when extraction output changes so old sidecars are ignored
+EXTRACTOR_VERSION = 1
+
+def _open_pdf(file_path: str):
+
+    # PyMuPDF and python-docx load on first use, keeping API startup light
+    import fitz  # PyMuPDF
+    return fitz.open(file_path)
+
+def _open_docx(file_path: str):
+
+    from docx import Document
+    return Document(file_path)
 
 def extract_text_from_pdf(file_path: str) -> str:
 
+    return "".join(iter_pdf_pages(file_path)).strip()
+
+def iter_pdf_pages(file_path: str) -> Iterator[str]:
+
+    try:
+        doc = _open_pdf(file_path)
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+    
+    # One page in memory at a time
     try:
-        text = ""
-        doc = fitz.open(file_path)
         for page in doc:
-            text += page.get_text()
+            yield page.get_text()
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+    finally:
         doc.close()
-        return text.strip()
+
+def get_pdf_page_count(file_path: str) -> int:
+
+    try:
+        with _open_pdf(file_path) as doc:
+            return doc.page_count
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+
+def extract_pdf_page_range(file_path: str, start: int, stop: int) -> List[str]:
+
+    # Module-level so it can run in a worker process
+    try:
+        with _open_pdf(file_path) as doc:
+            return [doc[i].get_text() for i in range(start, min(stop, doc.page_count))]
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
 def extract_text_from_docx(file_path: str) -> str:
 
     try:
-        doc = Document(file_path)
+        doc = _open_docx(file_path)
         text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
         return text.strip()
     except Exception as e:
@@ -33,13 +76,53 @@ def extract_text_from_txt(file_path: str) -> str:
     except Exception as e:
         raise Exception(f"Error extracting text from TXT: {str(e)}")
 
-def extract_text(file_path: str) -> str:
+def iter_docx_paragraphs(file_path: str) -> Iterator[str]:
+
+    try:
+        doc = _open_docx(file_path)
+    except Exception as e:
+        raise Exception(f"Error extracting text from DOCX: {str(e)}")
+    
+    # Same text as extract_text_from_docx, paragraphs joined by newlines
+    for i, paragraph in enumerate(doc.paragraphs):
+        yield paragraph.text if i == 0 else "\n" + paragraph.text
+
+def iter_txt_blocks(file_path: str) -> Iterator[str]:
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for block in iter(lambda: f.read(TXT_READ_BLOCK_SIZE), ""):
+                yield block
+    except Exception as e:
+        raise Exception(f"Error extracting text from TXT: {str(e)}")
+
+def iter_text(file_path: str) -> Iterator[str]:
 
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
     
     _, ext = os.path.splitext(file_path.lower())
     
+    if ext == '.pdf':
+        return iter_pdf_pages(file_path)
+    elif ext == '.docx':
+        return iter_docx_paragraphs(file_path)
+    elif ext == '.txt':
+        return iter_txt_blocks(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}. Supported formats: .pdf, .docx, .txt")
+
+def extract_text(file_path: str, use_sidecar: bool = True) -> str:
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+    
+    # Served from the extracted-text sidecar when the file is unchanged
+    if use_sidecar:
+        return "".join(iter_text_cached(file_path)).strip()
+    
+    _, ext = os.path.splitext(file_path.lower())
+    
     if ext == '.pdf':
         return extract_text_from_pdf(file_path)
     elif ext == '.docx':
@@ -49,6 +132,96 @@ def extract_text(file_path: str) -> str:
     else:
         raise ValueError(f"Unsupported file format: {ext}. Supported formats: .pdf, .docx, .txt")
 
+def compute_file_hash(file_path: str) -> str:
+
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def get_sidecar_dir(file_path: str) -> str:
+
+    # storage/subjects/<subject>/<unit>/docs/x.pdf -> storage/subjects/<subject>/<unit>/extracted
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(file_path))), "extracted")
+
+def get_sidecar_paths(file_path: str, file_hash: str) -> Tuple[str, str]:
+
+    base = os.path.join(get_sidecar_dir(file_path), f"{file_hash}.v{EXTRACTOR_VERSION}")
+    return f"{base}.txt.gz", f"{base}.json"
+
+def load_sidecar(file_path: str, file_hash: Optional[str] = None) -> Optional[Iterator[str]]:
+
+    file_hash = file_hash or compute_file_hash(file_path)
+    text_path, index_path = get_sidecar_paths(file_path, file_hash)
+    
+    # The index is written last, so its presence means the text is complete
+    try:
+        with open(index_path, 'r') as f:
+            offsets = json.load(f)["page_offsets"]
+    except (OSError, ValueError, KeyError):
+        return None
+    
+    def iter_pages():
+
+        with gzip.open(text_path, 'rt', encoding='utf-8') as f:
+            for start, end in zip(offsets, offsets[1:]):
+                yield f.read(end - start)
+    
+    return iter_pages()
+
+def write_sidecar(file_path: str, file_hash: str, pieces: Iterable[str]) -> Iterator[str]:
+
+    # Passes pieces through while compressing them to disk; the sidecar is only
+    # committed if the whole document was extracted
+    text_path, index_path = get_sidecar_paths(file_path, file_hash)
+    os.makedirs(os.path.dirname(text_path), exist_ok=True)
+    tmp_path = f"{text_path}.tmp{os.getpid()}"
+    offsets = [0]
+    
+    try:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for piece in pieces:
+                f.write(piece)
+                offsets.append(offsets[-1] + len(piece))
+                yield piece
+        
+        os.replace(tmp_path, text_path)
+        with open(index_path, 'w') as f:
+            json.dump({
+                "source": os.path.basename(file_path),
+                "sha256": file_hash,
+                "extractor_version": EXTRACTOR_VERSION,
+                "page_offsets": offsets
+            }, f)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def prune_sidecars(sidecar_dir: str, keep_hashes: Iterable[str]):
+
+    # Drops text extracted from files that are no longer in the unit
+    if not os.path.exists(sidecar_dir):
+        return
+    
+    keep_hashes = set(keep_hashes)
+    for filename in os.listdir(sidecar_dir):
+        if filename.split(".", 1)[0] not in keep_hashes:
+            try:
+                os.remove(os.path.join(sidecar_dir, filename))
+            except OSError:
+                pass
+
+def iter_text_cached(file_path: str, file_hash: Optional[str] = None) -> Iterator[str]:
+
+    file_hash = file_hash or compute_file_hash(file_path)
+    
+    cached = load_sidecar(file_path, file_hash)
+    if cached is not None:
+        return cached
+    
+    return write_sidecar(file_path, file_hash, iter_text(file_path))
+
 def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list[str]:
 
     if not text:
@@ -81,3 +254,47 @@ def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> l
             start = end
     
     return chunks
+
+def iter_chunks(pieces: Iterable[str], chunk_size: int = 1000, chunk_overlap: int = 200) -> Iterator[str]:
+
+    # Streaming version of chunk_text: pieces (e.g. PDF pages) are consumed one
+    # at a time and chunks may span piece boundaries, so memory stays at about
+    # one chunk plus one piece regardless of document size
+    buffer = ""
+    offset = 0  # position of buffer[0] in the whole document
+    start = 0   # position where the next chunk begins
+    
+    for piece in pieces:
+        # Match extract_text, which strips the document before chunking
+        if offset == 0 and not buffer:
+            piece = piece.lstrip()
+        buffer += piece
+        
+        # Only emit chunks that are certainly not the last one; trailing
+        # whitespace may turn out to be the end of the document
+        while len(buffer.rstrip()) - (start - offset) > chunk_size:
+            local_start = start - offset
+            end = local_start + chunk_size
+            
+            # Look for sentence boundary (., !, ?)
+            for punct in ['. ', '! ', '? ', '\n\n', '\n']:
+                last_punct = buffer.rfind(punct, local_start, end)
+                if last_punct != -1:
+                    end = last_punct + len(punct)
+                    break
+            
+            chunk = buffer[local_start:end].strip()
+            if chunk:
+                yield chunk
+            
+            # Never move backwards, text before start has been discarded
+            next_start = offset + end - chunk_overlap
+            if next_start <= start or chunk_overlap == 0:
+                next_start = offset + end
+            start = next_start
+            
+            buffer = buffer[start - offset:]
+            offset = start
+    
+    # What is left is the end of the document
+    yield from chunk_text(buffer[start - offset:].rstrip(), chunk_size, chunk_overlap)
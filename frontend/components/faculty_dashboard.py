@@ -2,9 +2,58 @@
 import streamlit as st
 import requests
 import os
+import time
 
 API_URL = "http://localhost:8000"
 
+# Seconds to wait on an embedding job before handing control back to the page
+EMBEDDING_PROGRESS_TIMEOUT = 600
+
+def show_embedding_progress(job_id):
+
+    progress_bar = st.progress(0.0)
+    status_text = st.empty()
+    
+    # Poll the embedding job until it finishes; a lost or stuck job must not
+    # block the page forever
+    deadline = time.monotonic() + EMBEDDING_PROGRESS_TIMEOUT
+    while True:
+        try:
+            response = requests.get(f"{API_URL}/faculty/jobs/{job_id}")
+            job = response.json()
+        except Exception as e:
+            status_text.error(f"Error checking embedding progress: {str(e)}")
+            return
+        
+        if response.status_code != 200:
+            status_text.error(job.get("detail", "Error checking embedding progress"))
+            return
+        
+        progress = job["progress"]
+        
+        if job["status"] == "queued":
+            status_text.info("⏳ Waiting for the embedding worker...")
+        elif job["status"] == "running":
+            files_total = progress["files_total"]
+            files_done = progress["files_done"]
+            if files_total:
+                progress_bar.progress(files_done / files_total)
+            eta = f" - about {int(progress['eta_seconds'])}s left" if progress["eta_seconds"] is not None else ""
+            status_text.info(f"🤖 Generating embeddings: {files_done}/{files_total} files, {progress['chunks_embedded']} chunks{eta}")
+        elif job["status"] == "done":
+            progress_bar.progress(1.0)
+            status_text.success("✅ Embeddings ready! Students can now access AI features.")
+            return
+        else:
+            status_text.error(f"❌ Embedding generation failed: {job.get('error') or 'Unknown error'}")
+            return
+        
+        if time.monotonic() >= deadline:
+            st.warning(f"Embedding job still {job['status']} after {EMBEDDING_PROGRESS_TIMEOUT}s. It keeps running in the background; check back later.")
+            return
+        
+        time.sleep(1)
+
 def faculty_dashboard():
 
     
@@ -100,8 +149,11 @@ def faculty_dashboard():
                                 st.success(f"✅ File '{result['filename']}' uploaded! Previous files in {subject}/{unit} have been replaced.")
                             else:
                                 st.success(f"✅ File '{result['filename']}' uploaded successfully!")
-                            st.info("🤖 Embeddings are being generated automatically in the background. This may take a few minutes.")
-                            st.info("📄 Students will be able to access AI features once processing is complete.")
+                            if result.get("job_id"):
+                                show_embedding_progress(result["job_id"])
+                            else:
+                                st.info("🤖 Embeddings are being generated automatically in the background. This may take a few minutes.")
+                                st.info("📄 Students will be able to access AI features once processing is complete.")
                         else:
                             st.error(response.json().get("detail", "Upload failed"))
                     except Exception as e:
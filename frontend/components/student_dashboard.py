@@ -1,9 +1,23 @@
 
 import streamlit as st
 import requests
+import uuid
+import json
 
 API_URL = "http://localhost:8000"
 
+def stream_events(path, payload):
+
+    # Reads the Server-Sent Events emitted by the /stream endpoints
+    with requests.post(f"{API_URL}{path}", json=payload, stream=True) as response:
+        if response.status_code != 200:
+            yield {"type": "error", "message": response.json().get("detail", "Request failed")}
+            return
+        
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
+
 def student_dashboard():
 
     
@@ -63,24 +77,28 @@ def student_dashboard():
         st.write("Get AI-generated structured notes from your study materials")
         
         if st.button("Generate Summary", key="gen_summary", use_container_width=True):
-            with st.spinner("Generating summary..."):
-                try:
-                    response = requests.post(
-                        f"{API_URL}/student/summary",
-                        json={"subject": subject, "unit": unit}
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data["status"] == "success":
-                            st.success("✅ Summary generated!")
-                            st.markdown(data["summary"])
-                        else:
-                            st.error(data.get("message", "Failed to generate summary"))
-                    else:
-                        st.error(response.json().get("detail", "Error generating summary"))
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
+            try:
+                status_placeholder = st.empty()
+                status_placeholder.info("⏳ Generating summary...")
+                summary_placeholder = st.empty()
+                summary = ""
+                error = None
+                
+                # Render tokens as they arrive instead of waiting for the full summary
+                for event in stream_events("/student/summary/stream", {"subject": subject, "unit": unit}):
+                    if event["type"] == "token":
+                        summary += event["content"]
+                        summary_placeholder.markdown(summary + "▌")
+                    elif event["type"] == "error":
+                        error = event.get("message", "Failed to generate summary")
+                
+                if error:
+                    status_placeholder.error(error)
+                else:
+                    status_placeholder.success("✅ Summary generated!")
+                summary_placeholder.markdown(summary)
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
     
     # Tab 2: MCQ Practice
     with tab2:
@@ -115,6 +133,8 @@ def student_dashboard():
                 st.session_state.quiz_current = 1
                 st.session_state.quiz_questions = []
                 st.session_state.quiz_answers = {}
+                # The backend keeps this session's questions and rejects repeats
+                st.session_state.quiz_session_id = uuid.uuid4().hex
                 st.session_state.answer_checked = False
                 st.session_state.selected_option = None
                 st.rerun()
@@ -134,22 +154,14 @@ def student_dashboard():
                 if len(st.session_state.quiz_questions) < current_q_num:
                     with st.spinner(f"Generating question {current_q_num}..."):
                         try:
-                            # Build context of previously asked questions
-                            previous_questions = []
-                            for prev_q in st.session_state.quiz_questions:
-                                previous_questions.append(prev_q['question'])
-                            
                             # Prepare request payload
                             request_data = {
                                 "subject": subject,
                                 "unit": unit,
-                                "count": 1
+                                "count": 1,
+                                "session_id": st.session_state.quiz_session_id
                             }
                             
-                            # Add previous questions to avoid repetition
-                            if previous_questions:
-                                request_data["previous_questions"] = previous_questions
-                            
                             response = requests.post(
                                 f"{API_URL}/student/mcq",
                                 json=request_data
@@ -411,6 +423,7 @@ def student_dashboard():
                 st.session_state.flashcard_total = num_cards
                 st.session_state.flashcard_current = 1
                 st.session_state.flashcard_list = []
+                st.session_state.flashcard_session_id = uuid.uuid4().hex
                 st.rerun()
         
         # Active Flashcard Session
@@ -428,22 +441,14 @@ def student_dashboard():
                 if len(st.session_state.flashcard_list) < current_card_num:
                     with st.spinner(f"Generating flashcard {current_card_num}..."):
                         try:
-                            # Build context of previously generated flashcards
-                            previous_cards = []
-                            for prev_card in st.session_state.flashcard_list:
-                                previous_cards.append(prev_card['front'])
-                            
                             # Prepare request payload
                             request_data = {
                                 "subject": subject,
                                 "unit": unit,
-                                "count": 1
+                                "count": 1,
+                                "session_id": st.session_state.flashcard_session_id
                             }
                             
-                            # Add previous flashcards to avoid repetition
-                            if previous_cards:
-                                request_data["previous_cards"] = previous_cards
-                            
                             response = requests.post(
                                 f"{API_URL}/student/flashcards",
                                 json=request_data
@@ -551,23 +556,34 @@ def student_dashboard():
             if not question:
                 st.warning("Please enter a question")
             else:
-                with st.spinner("Finding answer..."):
-                    try:
-                        response = requests.post(
-                            f"{API_URL}/student/ask",
-                            json={"subject": subject, "unit": unit, "question": question}
-                        )
-                        
-                        if response.status_code == 200:
-                            data = response.json()
-                            if data["status"] == "success":
-                                st.success("✅ Answer found!")
-                                st.markdown("### Answer:")
-                                st.write(data["answer"])
-                                st.caption(f"📚 Sources: {', '.join(data.get('sources', []))}")
-                            else:
-                                st.error(data.get("message", "Failed to get answer"))
-                        else:
-                            st.error(response.json().get("detail", "Error getting answer"))
-                    except Exception as e:
-                        st.error(f"Error: {str(e)}")
+                try:
+                    status_placeholder = st.empty()
+                    status_placeholder.info("⏳ Finding answer...")
+                    st.markdown("### Answer:")
+                    answer_placeholder = st.empty()
+                    answer = ""
+                    sources = []
+                    error = None
+                    
+                    # Render tokens as they arrive instead of waiting for the full answer
+                    for event in stream_events(
+                        "/student/ask/stream",
+                        {"subject": subject, "unit": unit, "question": question}
+                    ):
+                        if event["type"] == "sources":
+                            sources = event["sources"]
+                        elif event["type"] == "token":
+                            answer += event["content"]
+                            answer_placeholder.markdown(answer + "▌")
+                        elif event["type"] == "error":
+                            error = event.get("message", "Failed to get answer")
+                    
+                    if error:
+                        status_placeholder.error(error)
+                    else:
+                        status_placeholder.success("✅ Answer found!")
+                    answer_placeholder.markdown(answer)
+                    if sources:
+                        st.caption(f"📚 Sources: {', '.join(sources)}")
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")